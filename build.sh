@@ -1,6 +1,10 @@
 #!/bin/bash
 
-echo "Collecting static files..."
-python manage.py collectstatic --noinput
+if [ "$RUNTIME_PROFILE" = "minimal" ]; then
+    echo "Minimal runtime profile: skipping collectstatic"
+else
+    echo "Collecting static files..."
+    python manage.py collectstatic --noinput
+fi
 
 echo "Build completed!"
@@ -6,11 +6,14 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hamsa_ws.settings")
 django_asgi_app = get_asgi_application()
 
+from voice_agent.loopmon import install_signal_handler, monitor_loop  # noqa: E402
 from voice_agent.routing import websocket_urlpatterns  # noqa: E402
 
-application = ProtocolTypeRouter(
+install_signal_handler()
+
+application = monitor_loop(ProtocolTypeRouter(
     {
         "http": django_asgi_app,
         "websocket": URLRouter(websocket_urlpatterns),
     }
-)
+))
@@ -13,29 +13,86 @@ DEBUG = os.getenv("DEBUG", "True").lower() in ("true", "1", "yes")
 
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "*").split(",")
 
+# "full" (default) or "minimal". The minimal profile loads only what
+# hamsa_ws.asgi needs for the WebSocket and health routes: no auth,
+# contenttypes, DRF, database, staticfiles or WhiteNoise.
+RUNTIME_PROFILE = os.getenv("RUNTIME_PROFILE", "full").lower()
+MINIMAL_PROFILE = RUNTIME_PROFILE == "minimal"
+
 HAMSA_API_KEY = os.getenv("HAMSA_API_KEY", "")
 HAMSA_WS_URL = "wss://api.tryhamsa.com/v1/realtime/ws"
 
+# Process-wide pacing of Hamsa STT/TTS requests (requests per second).
+# The live rate adapts between MIN and MAX based on observed failures.
+HAMSA_RATE_LIMIT = float(os.getenv("HAMSA_RATE_LIMIT", "3"))
+HAMSA_RATE_BURST = float(os.getenv("HAMSA_RATE_BURST", "3"))
+HAMSA_RATE_MIN = float(os.getenv("HAMSA_RATE_MIN", "0.5"))
+HAMSA_RATE_MAX = float(os.getenv("HAMSA_RATE_MAX", "10"))
+
+# TTS transport: "auto" (adaptive WebSocket/REST selection), "ws" or "rest".
+TTS_TRANSPORT = os.getenv("TTS_TRANSPORT", "auto").lower()
+# Race both transports on the first sentence of each turn, keep the faster one
+TTS_RACE_FIRST_SENTENCE = os.getenv("TTS_RACE_FIRST_SENTENCE", "False").lower() in ("true", "1", "yes")
+
 WEBHOOK_URL = os.getenv(
     "WEBHOOK_URL",
     "https://primary-production-77c2.up.railway.app/webhook/besmart/voice/agent/",
 )
 
-INSTALLED_APPS = [
-    "daphne",
-    "django.contrib.auth",
-    "django.contrib.contenttypes",
-    "django.contrib.staticfiles",
-    "rest_framework",
-    "channels",
-    "voice_agent",
-]
-
-MIDDLEWARE = [
-    "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
-    "django.middleware.common.CommonMiddleware",
-]
+# Token for /debug/ endpoints (header X-Debug-Token or ?token=).
+# When unset, debug endpoints are only served with DEBUG on.
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN", "")
+
+# Event-loop monitoring: heartbeat interval and the lag that counts as a
+# stall (logged with the blocking stack; 0 disables). Sampling profiles
+# (/debug/profile/ or SIGUSR2) are written to PROFILE_DIR.
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "50"))
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "100"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/hamsa-profiles")
+PROFILE_SIGNAL_SECONDS = float(os.getenv("PROFILE_SIGNAL_SECONDS", "10"))
+
+# Local tracking dataset (.json / .ndjson / .csv) served by /tools/tracking/
+# for the agent's waybill and phone lookups (empty = disabled). Requests
+# need "Authorization: Bearer <TOOL_TOKEN>"; without TOOL_TOKEN they are
+# refused.
+TRACKING_DATA_PATH = os.getenv("TRACKING_DATA_PATH", "")
+TRACKING_RELOAD_INTERVAL = float(os.getenv("TRACKING_RELOAD_INTERVAL", "5"))
+TOOL_TOKEN = os.getenv("TOOL_TOKEN", "")
+
+# SQLite file for the write-behind turn/latency store (empty = disabled)
+TURN_STORE_PATH = os.getenv("TURN_STORE_PATH", "")
+TURN_STORE_MAX_QUEUE = int(os.getenv("TURN_STORE_MAX_QUEUE", "1000"))
+
+# Directory for opt-in session recordings (empty = disabled). Replay with:
+#   python manage.py replay_session <file>
+RECORD_SESSIONS_DIR = os.getenv("RECORD_SESSIONS_DIR", "")
+
+if MINIMAL_PROFILE:
+    INSTALLED_APPS = [
+        "channels",
+        "voice_agent",
+    ]
+
+    MIDDLEWARE = [
+        "django.middleware.security.SecurityMiddleware",
+        "django.middleware.common.CommonMiddleware",
+    ]
+else:
+    INSTALLED_APPS = [
+        "daphne",
+        "django.contrib.auth",
+        "django.contrib.contenttypes",
+        "django.contrib.staticfiles",
+        "rest_framework",
+        "channels",
+        "voice_agent",
+    ]
+
+    MIDDLEWARE = [
+        "django.middleware.security.SecurityMiddleware",
+        "whitenoise.middleware.WhiteNoiseMiddleware",
+        "django.middleware.common.CommonMiddleware",
+    ]
 
 TEMPLATES = [
     {
@@ -55,7 +112,7 @@ ROOT_URLCONF = "hamsa_ws.urls"
 ASGI_APPLICATION = "hamsa_ws.asgi.application"
 WSGI_APPLICATION = "hamsa_ws.wsgi.application"
 
-DATABASES = {
+DATABASES = {} if MINIMAL_PROFILE else {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
@@ -85,4 +142,5 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_DIRS = []
 
 # WhiteNoise configuration
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+if not MINIMAL_PROFILE:
+    STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class VoiceAgentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'voice_agent'
+
+    def ready(self):
+        from .tracking import tracking_store
+
+        # Index the tracking dataset before the first lookup needs it
+        tracking_store.load_in_background()
@@ -8,11 +8,15 @@ import sys
 import time
 import uuid
 
-import httpx
-import websockets
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.conf import settings
 
+from . import recording, registry
+from .loopmon import loop_monitor
+from .ratelimit import hamsa_limiter
+from .tts_transport import RACE, REST, WS, tts_selector
+from .turnstore import turn_store
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,6 +24,12 @@ def log(msg):
     print(msg, flush=True)
 
 
+def _preload_network_libs():
+    """Import httpx/websockets (kept off the cold-start import path)."""
+    import httpx  # noqa: F401
+    import websockets  # noqa: F401
+
+
 class RequestTimer:
     """Per-request timer to track elapsed time independently for each request."""
     def __init__(self, name: str):
@@ -49,14 +59,31 @@ class RequestTimer:
         return total
 
 
+# Hamsa returns a ~640-byte stub instead of audio when it throttles a TTS
+# request; real sentences are well above this (16kHz PCM = 32KB/s).
+TTS_MIN_COMPLETE_BYTES = 10000
+
+# Why a WebSocket TTS attempt came back short
+TTS_STUB = "stub"  # completed, but only the throttle stub arrived
+TTS_ERROR = "error"  # Hamsa sent an error message
+TTS_NETWORK = "network"  # timeout or connection error
+
+
 class VoiceAgentConsumer(AsyncWebsocketConsumer):
     # Shared HTTP client for connection pooling (reduces latency)
     _http_client = None
+    # Opt-in session recorder (see voice_agent.recording)
+    recorder = None
+    # Process-wide TTS transport choice (replaced by the replay's recorded routes)
+    tts_selector = tts_selector
+    # Write-behind turn/latency store (disabled for replays)
+    turn_store = turn_store
 
     @classmethod
     def get_http_client(cls):
         """Get or create shared HTTP client with connection pooling."""
         if cls._http_client is None:
+            import httpx
             cls._http_client = httpx.AsyncClient(
                 timeout=60.0,
                 limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
@@ -67,10 +94,27 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.session_id = self.scope["url_route"]["kwargs"].get("session_id") or str(uuid.uuid4())
         self.tts_ws = None  # Persistent TTS WebSocket connection
+        self.recorder = self._open_recorder()
+        # Live state read by the /debug/sessions/ endpoint (voice_agent.registry)
+        self.connected_at = time.monotonic()
+        self.stage = "idle"
+        self.stage_started = self.connected_at
+        self.turns = 0
+        self.tasks = set()
+        self.sentence_q = None
+        self.stt_ws = None
+        self.tts_bytes = 0
+        self.tts_chunks = 0
+        registry.register(self)
+        loop_monitor.ensure_started()
         await self.accept()
+        if "httpx" not in sys.modules:
+            # Warm the network stack in a thread while the client records audio
+            asyncio.get_running_loop().run_in_executor(None, _preload_network_libs)
         await self._send_status("متصل بالخادم")
 
     async def disconnect(self, close_code):
+        registry.unregister(self)
         # Clean up persistent TTS connection
         if self.tts_ws:
             try:
@@ -78,11 +122,18 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
                 log("[DISCONNECT] Closed persistent TTS WebSocket")
             except:
                 pass
+        if self.recorder:
+            path = await self.recorder.close()
+            self.recorder = None
+            if path:
+                log(f"[DISCONNECT] Session recorded to {path}")
         log(f"[DISCONNECT] Session {self.session_id} disconnected")
 
     async def receive(self, text_data=None, bytes_data=None):
         if text_data is None:
             return
+        if self.recorder:
+            self.recorder.record(recording.CLIENT_IN, text_data)
 
         try:
             data = json.loads(text_data)
@@ -95,16 +146,37 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
             await self._send_error("'audio_base64' is required")
             return
 
-        asyncio.create_task(self._run_pipeline(audio_base64))
+        self._track(asyncio.create_task(self._run_pipeline(audio_base64)))
+
+    def _open_recorder(self):
+        return recording.open_recorder(self.session_id)
+
+    def _track(self, task):
+        """Keep a reference to a background task while it runs (shown in the registry)."""
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def _set_stage(self, stage):
+        self.stage = stage
+        self.stage_started = time.monotonic()
 
     async def _run_pipeline(self, audio_base64):
         """Orchestrate: STT -> Webhook+TTS streamed together"""
+        start = time.time()
+        # Turn record for the write-behind store; stage timings in ms
+        turn = {"session_id": self.session_id, "ts": start, "status": "error"}
+        self.turns += 1
         try:
             # Step 1: STT
+            self._set_stage("stt")
             await self._send_status("جاري التعرف على الصوت...")
             transcription = await self._call_stt(audio_base64)
+            turn["stt_ms"] = (time.time() - start) * 1000
+            turn["transcription"] = transcription
             log(f"[PIPELINE] STT result: '{transcription}' (len={len(transcription) if transcription else 0})")
             if not transcription:
+                turn["status"] = "no_transcription"
                 await self._send_error("لم يتم التعرف على أي نص")
                 return
 
@@ -116,13 +188,19 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
             log(f"[PIPELINE] Calling webhook with: '{transcription}'")
             await self._send_status("جاري التفكير...")
 
+            self._set_stage("webhook")
             sentence_q = asyncio.Queue()
-            tts_task = asyncio.create_task(self._tts_consumer(sentence_q))
+            self.sentence_q = sentence_q
+            tts_start = time.time()
+            tts_task = self._track(asyncio.create_task(self._tts_consumer(sentence_q)))
 
             agent_response = await self._call_webhook(transcription, sentence_q)
+            turn["webhook_ms"] = (time.time() - tts_start) * 1000
+            turn["response"] = agent_response
             log(f"[PIPELINE] Webhook result: '{agent_response}' (len={len(agent_response) if agent_response else 0})")
 
             if not agent_response:
+                turn["status"] = "no_response"
                 await self._send_error("لم يتم الحصول على رد من الوكيل")
                 # Signal TTS consumer to stop
                 await sentence_q.put(None)
@@ -135,22 +213,35 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
             }))
 
             # Signal TTS consumer to finish and wait
+            self._set_stage("tts")
             await sentence_q.put(None)
-            await tts_task
+            first_audio_at = await tts_task
+            turn["tts_ms"] = (time.time() - tts_start) * 1000
+            if first_audio_at:
+                turn["first_audio_ms"] = (first_audio_at - start) * 1000
 
             # Small delay to ensure all TTS chunks are transmitted over WebSocket
             await asyncio.sleep(0.5)
 
             await self.send(text_data=json.dumps({"type": "done"}))
+            turn["status"] = "ok"
             log("[PIPELINE] Done!")
 
         except Exception as e:
             log(f"[PIPELINE] ERROR: {type(e).__name__}: {e}")
             await self._send_error(str(e))
+        finally:
+            turn["total_ms"] = (time.time() - start) * 1000
+            self.turn_store.enqueue(turn)
+            self._set_stage("idle")
 
     async def _tts_consumer(self, sentence_q):
-        """Read sentences from queue, TTS each via REST streaming, stream chunks to client."""
+        """Read sentences from queue, TTS each, stream chunks to client.
+
+        Returns the time the first audio chunk of the turn was received, or None.
+        """
         idx = 0
+        first_audio_at = None
         while True:
             sentence = await sentence_q.get()
             if sentence is None:
@@ -164,15 +255,92 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
             log(f"[TTS-STREAM] sentence {idx}: '{sentence[:80]}'")
             await self._send_status("جاري تحويل الرد إلى صوت...")
             try:
-                # Use persistent WebSocket connection (recommended by Hamsa API docs)
-                # Alternative: await self._call_tts_stream(sentence)  # REST streaming API
-                await self._call_tts_ws(sentence)
+                race = idx == 1 and settings.TTS_RACE_FIRST_SENTENCE
+                audio_at = await self._synthesize(sentence, race=race)
+                first_audio_at = first_audio_at or audio_at
             except Exception as e:
                 log(f"[TTS-STREAM] ERROR on sentence {idx}: {type(e).__name__}: {e}")
+        return first_audio_at
+
+    async def _synthesize(self, text, race=False):
+        """TTS one sentence over the transport picked by tts_selector, return first audio time."""
+        if race and self.tts_selector.mode == "auto" and self.tts_selector.alternative(WS):
+            self._record_route(RACE)
+            return await self._race_tts(text)
+
+        transport = self.tts_selector.choose()
+        self._record_route(transport)
+        total_bytes, first_audio_at = await self._run_tts_transport(transport, text)
+        if total_bytes <= TTS_MIN_COMPLETE_BYTES:
+            # Nothing usable reached the client, so the sentence is retried elsewhere
+            fallback = self.tts_selector.alternative(transport)
+            if fallback:
+                log(f"[TTS] {transport} produced {total_bytes} bytes, failing over to {fallback}")
+                if self.recorder:
+                    self.recorder.record(recording.TTS_FAILOVER, fallback)
+                total_bytes, fallback_audio_at = await self._run_tts_transport(fallback, text)
+                first_audio_at = first_audio_at or fallback_audio_at
+        return first_audio_at
+
+    async def _race_tts(self, text):
+        """Run both transports; the first to produce usable audio wins, the other is cancelled.
+
+        Each side holds its audio until it has more than
+        TTS_MIN_COMPLETE_BYTES, so a throttle stub never wins. When neither
+        side got there, the sentence is synthesized again without racing.
+        """
+        winner = None
+
+        def claim(name):
+            nonlocal winner
+            if winner is None:
+                winner = name
+                for other, task in tasks.items():
+                    if other != name:
+                        task.cancel()
+            return winner == name
+
+        tasks = {
+            name: asyncio.create_task(self._run_tts_transport(name, text, claim))
+            for name in (WS, REST)
+        }
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        log(f"[TTS] race winner: {winner or 'none'}")
+        if winner:
+            return results[list(tasks).index(winner)][1]
+        log("[TTS] no usable audio from either transport, retrying without race")
+        return await self._synthesize(text)
+
+    async def _run_tts_transport(self, transport, text, claim=None):
+        """Call one TTS transport. Returns (total_bytes, first_audio_at).
+
+        The transports report each attempt to tts_selector themselves; a
+        transport that raises is recorded here as one failed attempt.
+        """
+        try:
+            if transport == WS:
+                return await self._call_tts_ws(text, claim)
+            return await self._call_tts_stream(text, claim)
+        except Exception as e:
+            log(f"[TTS] {transport} failed: {type(e).__name__}: {e}")
+            self.tts_selector.record(transport, None, False)
+            return 0, None
+
+    def _record_tts_attempt(self, transport, start, first_audio_at, total_bytes):
+        ttfa = (first_audio_at - start) * 1000 if first_audio_at else None
+        self.tts_selector.record(transport, ttfa, total_bytes > TTS_MIN_COMPLETE_BYTES)
+        if ttfa is not None:
+            log(f"[TTS] {transport} time to first audio: {ttfa:.0f}ms")
+
+    def _record_route(self, route):
+        if self.recorder:
+            self.recorder.record(recording.TTS_ROUTE, route)
 
     async def _connect_hamsa_ws(self):
         """Connect to Hamsa WS with retry."""
+        import websockets
         url = f"{settings.HAMSA_WS_URL}?api_key={settings.HAMSA_API_KEY}"
+        start = time.perf_counter()
         for attempt in range(3):
             try:
                 ws = await asyncio.wait_for(
@@ -181,6 +349,8 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
                 )
                 init_msg = await asyncio.wait_for(ws.recv(), timeout=3.0)
                 log(f"[HAMSA] connected (attempt {attempt + 1}): {init_msg}")
+                if self.recorder:
+                    ws = self.recorder.wrap_ws(ws, (time.perf_counter() - start) * 1000)
                 return ws
             except Exception as e:
                 log(f"[HAMSA] connection attempt {attempt + 1} failed: {type(e).__name__}: {e}")
@@ -200,10 +370,14 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
 
         connect_start = timer.elapsed_ms()
         ws = await self._connect_hamsa_ws()
+        self.stt_ws = ws
         timer.log_checkpoint("Connected")
         log(f"[STT] Connection took: {timer.elapsed_ms() - connect_start:.0f}ms")
 
         try:
+            waited = await hamsa_limiter.acquire("stt")
+            if waited >= 1:
+                log(f"[STT] Paced by rate limiter: {waited:.0f}ms")
             send_start = timer.elapsed_ms()
             await ws.send(json.dumps({
                 "type": "stt",
@@ -233,6 +407,8 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
                     if msg_type == "error":
                         err = data.get("payload", {}).get("message", "STT error")
                         log(f"[STT] ERROR: {err}")
+                        if hamsa_limiter.observe_error(err):
+                            log(f"[STT] Rate limited, limiter now at {hamsa_limiter.rate:.2f} req/s")
                         await self._send_error(err)
                         return None
                     elif msg_type == "end":
@@ -240,6 +416,7 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
                         break
                     elif msg_type == "transcription":
                         transcription = data.get("payload", {}).get("text", "")
+                        hamsa_limiter.on_success()
                         log(f"[STT] transcription from JSON: {transcription}")
                         log(f"[STT] Processing took: {timer.elapsed_ms() - recv_start:.0f}ms")
                         break
@@ -254,6 +431,7 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
             await self._send_error("STT timeout")
         finally:
             await ws.close()
+            self.stt_ws = None
 
         timer.log_complete()
         return transcription
@@ -283,7 +461,7 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
         log(f"[WEBHOOK] payload: text='{text}', session_id='{self.session_id}'")
 
         # Use shared HTTP client for better connection pooling
-        client = self.get_http_client()
+        client = self._get_client()
         first_chunk_received = False
         async with client.stream(
                 "POST",
@@ -474,36 +652,62 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
                 self.tts_ws = await self._connect_hamsa_ws()
         return self.tts_ws
 
-    async def _call_tts_ws(self, text):
-        """Call Hamsa WebSocket TTS using persistent connection, stream audio chunks to client in real-time."""
-        # Retry logic for 640-byte failures (API rate limiting)
-        max_retries = 2
+    async def _call_tts_ws(self, text, claim=None):
+        """Call Hamsa WebSocket TTS using persistent connection, stream audio chunks to client in real-time.
+
+        Returns (total_bytes, first_audio_at). While racing (``claim`` set)
+        there is a single attempt: the REST request is the retry.
+        """
+        # Requests are paced by the shared limiter before they are sent. A
+        # truncated response (640-byte stub = rate limited) lowers the shared
+        # rate, and the retry simply waits its turn in the limiter queue.
+        # Error messages are already fed to the limiter by _do_tts_request,
+        # and timeouts/connection errors say nothing about throttling.
+        max_retries = 2 if claim is None else 0
+        first_audio_at = None
         for attempt in range(max_retries + 1):
-            total_bytes = await self._do_tts_request(text, attempt)
-
-            # Check if we got complete audio (>10KB typically means success)
-            if total_bytes > 10000:
-                return  # Success!
-
-            # Incomplete audio (640 bytes), retry if we have attempts left
+            start = time.time()
+            total_bytes, attempt_first_audio, failure = await self._do_tts_request(text, attempt, claim)
+            first_audio_at = first_audio_at or attempt_first_audio
+            self._record_tts_attempt(WS, start, attempt_first_audio, total_bytes)
+
+            if total_bytes > TTS_MIN_COMPLETE_BYTES:
+                hamsa_limiter.on_success()
+                return total_bytes, first_audio_at  # Success!
+
+            if failure is None:
+                failure = TTS_STUB
+                hamsa_limiter.on_rate_limited()
             if attempt < max_retries:
-                delay = 2 ** attempt  # Exponential backoff: 1s, 2s
-                log(f"[TTS-WS] ⚠️  Incomplete audio ({total_bytes} bytes), retrying in {delay}s... (attempt {attempt + 1}/{max_retries})")
-                await asyncio.sleep(delay)
+                log(f"[TTS-WS] ⚠️  Incomplete audio ({total_bytes} bytes, {failure}), limiter now at {hamsa_limiter.rate:.2f} req/s, retrying (attempt {attempt + 1}/{max_retries})")
                 # Force reconnection on retry
                 self.tts_ws = None
             else:
                 log(f"[TTS-WS] ❌ Failed after {max_retries + 1} attempts, got {total_bytes} bytes")
                 # Still failed, but we sent what we got
+        return total_bytes, first_audio_at
+
+    async def _do_tts_request(self, text, attempt_num=0, claim=None):
+        """Perform single TTS request.
+
+        Returns (total bytes received, first audio time, failure), where
+        failure is None when the response ran to completion, TTS_ERROR when
+        Hamsa sent an error message (already fed to the limiter) and
+        TTS_NETWORK on timeouts and connection errors.
 
-    async def _do_tts_request(self, text, attempt_num=0):
-        """Perform single TTS request, return total bytes received."""
+        While racing, audio is held back until the response is known not to
+        be the throttle stub (more than TTS_MIN_COMPLETE_BYTES received) and
+        only then claimed and flushed to the client.
+        """
         timer = RequestTimer(f"TTS-WS-{id(self)}")  # Unique ID per request
 
         # Get or reuse persistent connection
         ws = await self._get_or_create_tts_ws()
 
         try:
+            waited = await hamsa_limiter.acquire("tts")
+            if waited >= 1:
+                log(f"[TTS-WS] Paced by rate limiter: {waited:.0f}ms")
             await ws.send(json.dumps({
                 "type": "tts",
                 "payload": {
@@ -518,8 +722,10 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
 
             chunk_count = 0
             total_bytes = 0
-            first_chunk_received = False
+            first_audio_at = None
             end_received = False
+            failure = None
+            held = [] if claim is not None else None
 
             while True:
                 try:
@@ -536,17 +742,28 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
                         raise
 
                 if isinstance(response, bytes):
-                    if not first_chunk_received:
-                        timer.log_checkpoint("First audio chunk")
-                        first_chunk_received = True
                     chunk_count += 1
                     total_bytes += len(response)
+                    self.tts_bytes += len(response)
+                    self.tts_chunks += 1
                     if chunk_count % 10 == 0 or chunk_count <= 5:  # Log first 5, then every 10th
                         log(f"[TTS-WS] chunk #{chunk_count}, total: {total_bytes} bytes")
-                    await self.send(text_data=json.dumps({
-                        "type": "tts_chunk",
-                        "audio_base64": base64.b64encode(response).decode("utf-8"),
-                    }))
+                    chunks = [response]
+                    if held is not None:
+                        held.append(response)
+                        if total_bytes <= TTS_MIN_COMPLETE_BYTES:
+                            continue
+                        if not claim(WS):
+                            raise asyncio.CancelledError()
+                        chunks, held = held, None
+                    if first_audio_at is None:
+                        timer.log_checkpoint("First audio chunk")
+                        first_audio_at = time.time()
+                    for chunk in chunks:
+                        await self.send(text_data=json.dumps({
+                            "type": "tts_chunk",
+                            "audio_base64": base64.b64encode(chunk).decode("utf-8"),
+                        }))
                     continue
 
                 # JSON control message
@@ -561,7 +778,10 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
                         # Don't break immediately - wait for any remaining audio chunks
                         # Will timeout after 30s if no more chunks come
                     elif msg_type == "error":
-                        log(f"[TTS-WS] error: {data.get('payload', {}).get('message', '')}")
+                        err = data.get('payload', {}).get('message', '')
+                        log(f"[TTS-WS] error: {err}")
+                        hamsa_limiter.observe_error(err)
+                        failure = TTS_ERROR
                         break
                     else:
                         log(f"[TTS-WS] msg: {data}")
@@ -570,19 +790,28 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
 
             total_time = timer.elapsed_ms()
             log(f"[TTS-WS] <<< COMPLETE: {chunk_count} chunks, {total_bytes} bytes, {total_time:.0f}ms total")
-            return total_bytes
+            return total_bytes, first_audio_at, failure
+        except asyncio.CancelledError:
+            # Lost a TTS race: the socket still has this request's audio in flight
+            log("[TTS-WS] cancelled - dropping connection")
+            self.tts_ws = None
+            asyncio.create_task(ws.close())
+            raise
         except asyncio.TimeoutError:
             log("[TTS-WS] timeout - marking connection for reconnection")
             self.tts_ws = None  # Mark for reconnection
-            return 0
+            return 0, None, TTS_NETWORK
         except Exception as e:
             log(f"[TTS-WS] error: {type(e).__name__}: {e} - marking connection for reconnection")
             self.tts_ws = None  # Mark for reconnection
-            return 0
+            return 0, None, TTS_NETWORK
         # Don't close connection - reuse it for next request!
 
-    async def _call_tts_stream(self, text):
-        """Call Hamsa REST Streaming TTS API, stream audio chunks to client in real-time."""
+    async def _call_tts_stream(self, text, claim=None):
+        """Call Hamsa REST Streaming TTS API, stream audio chunks to client in real-time.
+
+        Returns (total_bytes, first_audio_at).
+        """
         timer = RequestTimer(f"TTS-STREAM-{id(self)}")
 
         url = "https://api.tryhamsa.com/v1/realtime/tts-stream"
@@ -601,47 +830,88 @@ class VoiceAgentConsumer(AsyncWebsocketConsumer):
 
         chunk_count = 0
         total_bytes = 0
-        first_chunk_received = False
+        first_audio_at = None
+        # While racing, audio is held back until it cannot be the throttle stub
+        held = [] if claim is not None else None
 
+        start = time.time()
         try:
+            waited = await hamsa_limiter.acquire("tts")
+            if waited >= 1:
+                log(f"[TTS-STREAM] Paced by rate limiter: {waited:.0f}ms")
             # Use shared HTTP client for better connection pooling
-            client = self.get_http_client()
+            client = self._get_client()
             async with client.stream("POST", url, json=body, headers=headers) as response:
                 log(f"[TTS-STREAM] <<< RESPONSE: HTTP {response.status_code}")
 
                 if response.status_code != 200:
                     error_text = await response.aread()
                     log(f"[TTS-STREAM] ERROR: HTTP {response.status_code} - {error_text[:200]}")
-                    return 0
+                    if response.status_code == 429:
+                        retry_after = response.headers.get("Retry-After")
+                        hamsa_limiter.on_rate_limited(
+                            float(retry_after) if retry_after and retry_after.isdigit() else None
+                        )
+                    else:
+                        hamsa_limiter.observe_error(error_text.decode("utf-8", "replace"))
+                    self._record_tts_attempt(REST, start, None, 0)
+                    return 0, None
 
                 # Stream audio chunks to client as they arrive
                 async for chunk in response.aiter_bytes(chunk_size=8192):
                     if not chunk:
                         continue
 
-                    if not first_chunk_received:
-                        timer.log_checkpoint("First audio chunk")
-                        first_chunk_received = True
-
                     chunk_count += 1
                     total_bytes += len(chunk)
+                    self.tts_bytes += len(chunk)
+                    self.tts_chunks += 1
 
                     if chunk_count % 10 == 0 or chunk_count <= 5:
                         log(f"[TTS-STREAM] chunk #{chunk_count}, total: {total_bytes} bytes")
 
-                    # Send audio chunk to client immediately
-                    await self.send(text_data=json.dumps({
-                        "type": "tts_chunk",
-                        "audio_base64": base64.b64encode(chunk).decode("utf-8"),
-                    }))
+                    chunks = [chunk]
+                    if held is not None:
+                        held.append(chunk)
+                        if total_bytes <= TTS_MIN_COMPLETE_BYTES:
+                            continue
+                        if not claim(REST):
+                            raise asyncio.CancelledError()
+                        chunks, held = held, None
+                    if first_audio_at is None:
+                        timer.log_checkpoint("First audio chunk")
+                        first_audio_at = time.time()
+
+                    # Send audio to client immediately
+                    for chunk in chunks:
+                        await self.send(text_data=json.dumps({
+                            "type": "tts_chunk",
+                            "audio_base64": base64.b64encode(chunk).decode("utf-8"),
+                        }))
 
             total_time = timer.elapsed_ms()
             log(f"[TTS-STREAM] <<< COMPLETE: {chunk_count} chunks, {total_bytes} bytes, {total_time:.0f}ms total")
-            return total_bytes
+            if total_bytes > TTS_MIN_COMPLETE_BYTES:
+                hamsa_limiter.on_success()
+            self._record_tts_attempt(REST, start, first_audio_at, total_bytes)
+            return total_bytes, first_audio_at
 
         except Exception as e:
             log(f"[TTS-STREAM] error: {type(e).__name__}: {e}")
-            return 0
+            self.tts_selector.record(REST, None, False)
+            return total_bytes, first_audio_at
+
+    def _get_client(self):
+        """Shared HTTP client, wrapped by the session recorder when enabled."""
+        client = self.get_http_client()
+        if self.recorder:
+            client = self.recorder.wrap_http(client)
+        return client
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        if self.recorder and text_data is not None:
+            self.recorder.record(recording.CLIENT_OUT, text_data)
+        await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
 
     async def _send_status(self, message):
         await self.send(text_data=json.dumps({"type": "status", "message": message}))
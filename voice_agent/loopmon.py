@@ -0,0 +1,210 @@
+"""Event-loop stall detection and on-demand sampling profiler.
+
+Every session in the process shares one asyncio loop, so a slow
+synchronous callback delays all of them. ``LoopMonitor`` runs a heartbeat
+coroutine on the loop plus a watchdog thread: when the heartbeat is late
+by more than the stall threshold, the watchdog captures the loop thread's
+stack while the offending callback is still running, and the heartbeat
+logs it once the loop is free again.
+
+``start_profile`` samples the loop thread's stack from a background thread
+for N seconds and writes folded stacks (``frame;frame;frame count``), the
+input format of flamegraph.pl and speedscope. It is triggered from the
+``/debug/profile/`` endpoint or by sending SIGUSR2 to the process.
+
+``hamsa_ws.asgi`` installs the SIGUSR2 handler when the app is loaded and
+wraps the application with ``monitor_loop``, which records the loop thread
+on the first connection or request; profiling therefore works even with
+stall detection disabled (``LOOP_STALL_THRESHOLD_MS=0``).
+"""
+import asyncio
+import collections
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+from django.conf import settings
+
+CONSUMER_MODULE = "voice_agent.consumers"
+
+
+def log(msg):
+    print(msg, flush=True)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class LoopMonitor:
+    def __init__(self, interval_ms: float, threshold_ms: float):
+        self.interval = interval_ms / 1000
+        self.threshold_ms = threshold_ms
+        self.loop_thread_id = None
+        self._beat = None
+        self._stall_stack = None
+        self._task = None
+        self.started = False
+        self.samples = 0
+        self.lag_ms = 0.0
+        self.avg_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.stalls = 0
+        self.last_stall = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def ensure_started(self):
+        """Record the loop thread and start the heartbeat and watchdog on the running loop (idempotent)."""
+        if self.loop_thread_id is None:
+            self.loop_thread_id = threading.get_ident()
+        if self.started or not self.enabled:
+            return
+        self.started = True
+        self._beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True).start()
+        log(f"[LOOP] monitor started (interval {self.interval * 1000:.0f}ms, stall threshold {self.threshold_ms:.0f}ms)")
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - expected) * 1000
+            self.samples += 1
+            self.lag_ms = lag
+            self.avg_lag_ms += 0.05 * (lag - self.avg_lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag)
+            if lag >= self.threshold_ms:
+                self.stalls += 1
+                stack = self._stall_stack or "  (stack not captured)\n"
+                self._stall_stack = None
+                self.last_stall = {"at": time.time(), "lag_ms": round(lag), "stack": stack}
+                log(f"[LOOP] ⚠️  event loop stalled for {lag:.0f}ms, blocking stack:\n{stack}")
+
+    def _watchdog(self):
+        """Capture the loop thread's stack while the heartbeat is overdue."""
+        late_after = self.interval + self.threshold_ms / 1000
+        while True:
+            time.sleep(self.interval / 2)
+            if self._stall_stack is not None:
+                continue
+            if time.monotonic() - self._beat < late_after:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is not None:
+                self._stall_stack = "".join(traceback.format_stack(frame, limit=20))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "started": self.started,
+            "threshold_ms": self.threshold_ms,
+            "lag_ms": round(self.lag_ms, 1),
+            "avg_lag_ms": round(self.avg_lag_ms, 1),
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "stalls": self.stalls,
+            "last_stall": self.last_stall,
+            "profiling": _profile_lock.locked(),
+        }
+
+
+loop_monitor = LoopMonitor(
+    interval_ms=settings.LOOP_MONITOR_INTERVAL_MS,
+    threshold_ms=settings.LOOP_STALL_THRESHOLD_MS,
+)
+
+_profile_lock = threading.Lock()
+
+
+def _sample_loop(seconds: float, interval: float, path: str):
+    thread_id = loop_monitor.loop_thread_id
+    stacks = collections.Counter()
+    by_method = collections.Counter()
+    total = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            labels = []
+            method = None
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                if method is None and frame.f_globals.get("__name__") == CONSUMER_MODULE:
+                    method = labels[-1]
+                frame = frame.f_back
+            stacks[";".join(reversed(labels))] += 1
+            by_method[method or "(outside consumer)"] += 1
+            total += 1
+        time.sleep(interval)
+
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    summary = ", ".join(
+        f"{name} {count * 100 / total:.0f}%" for name, count in by_method.most_common(5)
+    ) if total else "no samples"
+    log(f"[PROFILE] {total} samples over {seconds:.0f}s written to {path}: {summary}")
+
+
+def start_profile(seconds: float, interval_ms: float = 5.0):
+    """Profile the loop thread in the background; returns the output path, or None if busy.
+
+    Raises OSError when ``PROFILE_DIR`` cannot be created.
+    """
+    if loop_monitor.loop_thread_id is None:
+        return None
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, f"loop-{int(time.time())}.folded")
+
+    def run():
+        try:
+            _sample_loop(seconds, interval_ms / 1000, path)
+        finally:
+            _profile_lock.release()
+
+    try:
+        threading.Thread(target=run, name="loop-profiler", daemon=True).start()
+    except BaseException:
+        _profile_lock.release()
+        raise
+    log(f"[PROFILE] sampling event loop for {seconds:.0f}s -> {path}")
+    return path
+
+
+def _on_profile_signal(signum, frame):
+    try:
+        path = start_profile(settings.PROFILE_SIGNAL_SECONDS)
+    except OSError as e:
+        log(f"[PROFILE] cannot write profiles to {settings.PROFILE_DIR}: {e}")
+        return
+    if path is None:
+        log("[PROFILE] SIGUSR2 ignored: profiler busy or event loop not started yet")
+
+
+def install_signal_handler() -> bool:
+    """Make SIGUSR2 start a profile. Only possible from the main thread."""
+    if not hasattr(signal, "SIGUSR2") or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signal.SIGUSR2, _on_profile_signal)
+    return True
+
+
+def monitor_loop(app):
+    """Wrap an ASGI application so the first connection or request starts loop monitoring."""
+    async def monitored(scope, receive, send):
+        loop_monitor.ensure_started()
+        return await app(scope, receive, send)
+
+    return monitored
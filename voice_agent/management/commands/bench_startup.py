@@ -0,0 +1,130 @@
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PROFILES = ("full", "minimal")
+
+
+def _profile_env(profile):
+    env = dict(os.environ)
+    env["RUNTIME_PROFILE"] = profile
+    env["DJANGO_SETTINGS_MODULE"] = "hamsa_ws.settings"
+    env["PYTHONPATH"] = str(settings.BASE_DIR)
+    return env
+
+
+def _import_times(profile):
+    """Import hamsa_ws.asgi in a fresh interpreter with -X importtime.
+
+    Returns (total_ms, [(self_ms, cumulative_ms, module), ...]).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import hamsa_ws.asgi"],
+        env=_profile_env(profile),
+        cwd=settings.BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise CommandError(f"[{profile}] import failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        rows.append((int(self_us) / 1000, int(cumulative_us) / 1000, module))
+        if module == "hamsa_ws.asgi":
+            total = int(cumulative_us) / 1000
+    return total, rows
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _time_to_first_connection(profile, timeout):
+    """Start daphne and poll the agent WebSocket until it is accepted (ms)."""
+    from websockets.sync.client import connect
+
+    port = _free_port()
+    url = f"ws://127.0.0.1:{port}/ws/agent/bench-startup/"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        ["daphne", "-b", "127.0.0.1", "-p", str(port), "hamsa_ws.asgi:application"],
+        env=_profile_env(profile),
+        cwd=settings.BASE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise CommandError(f"[{profile}] daphne exited with code {proc.returncode}")
+            try:
+                with connect(url, open_timeout=1) as ws:
+                    ws.recv(timeout=1)  # first status message = accepted
+                    return (time.perf_counter() - start) * 1000
+            except (OSError, TimeoutError):
+                time.sleep(0.005)
+        raise CommandError(f"[{profile}] no accepted connection after {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark cold start per runtime profile: per-module import time of "
+        "hamsa_ws.asgi and time to first accepted WebSocket connection."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", choices=PROFILES, action="append",
+                            help="Profile(s) to benchmark (default: all)")
+        parser.add_argument("--runs", type=int, default=3,
+                            help="Cold starts per profile (median is reported)")
+        parser.add_argument("--top", type=int, default=15,
+                            help="Number of slowest modules to list")
+        parser.add_argument("--timeout", type=float, default=30.0,
+                            help="Seconds to wait for daphne to accept a connection")
+
+    def handle(self, *args, **options):
+        profiles = options["profile"] or PROFILES
+        runs = max(1, options["runs"])
+
+        for profile in profiles:
+            self.stdout.write(f"=== profile: {profile} ===")
+
+            totals = []
+            rows = []
+            for _ in range(runs):
+                total, rows = _import_times(profile)
+                totals.append(total)
+            self.stdout.write(
+                f"import hamsa_ws.asgi: {statistics.median(totals):.1f}ms "
+                f"(median of {runs})"
+            )
+
+            self.stdout.write(f"{'self ms':>9}{'cumul ms':>10}  module")
+            for self_ms, cumulative_ms, module in sorted(rows, reverse=True)[:options["top"]]:
+                self.stdout.write(f"{self_ms:>9.1f}{cumulative_ms:>10.1f}  {module}")
+
+            accepted = [
+                _time_to_first_connection(profile, options["timeout"])
+                for _ in range(runs)
+            ]
+            self.stdout.write(
+                f"time to first accepted connection: {statistics.median(accepted):.0f}ms "
+                f"(median of {runs}, min {min(accepted):.0f}ms)\n"
+            )
@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand
+
+from voice_agent.recording import replay
+
+
+def _summarize(messages):
+    """Key latency markers (ms from session start) for client-bound frames."""
+    summary = {"tokens": 0, "tts_chunks": 0}
+    for t, text in messages:
+        try:
+            msg_type = json.loads(text).get("type", "")
+        except (TypeError, json.JSONDecodeError):
+            continue
+        if msg_type == "token":
+            summary["tokens"] += 1
+            summary.setdefault("first_token_ms", t)
+        elif msg_type == "tts_chunk":
+            summary["tts_chunks"] += 1
+            summary.setdefault("first_audio_ms", t)
+        elif msg_type in ("transcription", "agent_response", "done", "error"):
+            summary.setdefault(f"{msg_type}_ms", t)
+    return summary
+
+
+class Command(BaseCommand):
+    help = "Replay a recorded session through VoiceAgentConsumer without network access."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Recording file (.ndjson.gz)")
+        parser.add_argument(
+            "--speed", type=float, default=1.0,
+            help="Timing scale: 1.0 = original, 2.0 = twice as fast, 0 = no delays",
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Print the summary as JSON",
+        )
+
+    def handle(self, *args, **options):
+        recorded, replayed = asyncio.run(replay(options["path"], options["speed"]))
+        result = {"recorded": _summarize(recorded), "replayed": _summarize(replayed)}
+
+        if options["json"]:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        keys = sorted(set(result["recorded"]) | set(result["replayed"]))
+        self.stdout.write(f"{'metric':<20}{'recorded':>12}{'replayed':>12}")
+        for key in keys:
+            rec = result["recorded"].get(key, "-")
+            rep = result["replayed"].get(key, "-")
+            self.stdout.write(f"{key:<20}{rec!s:>12}{rep!s:>12}")
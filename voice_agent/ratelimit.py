@@ -0,0 +1,132 @@
+"""Process-wide token-bucket limiter for Hamsa STT/TTS requests.
+
+All consumers in the process share one bucket, so concurrent sessions are
+paced together before a request is sent instead of each one retrying after
+Hamsa has already rejected it. The rate adapts AIMD-style: every failure
+(truncated audio, rate-limit error message) halves it and drains the
+bucket, every success nudges it back up. Waiters are served FIFO; since a
+session only has one TTS request in flight at a time, FIFO is fair across
+sessions.
+"""
+import asyncio
+import re
+import time
+
+from django.conf import settings
+
+# Hamsa error messages that indicate throttling rather than a bad request
+_RATE_LIMIT_RE = re.compile(r"rate.?limit|too many|quota|throttl|429", re.IGNORECASE)
+_RETRY_AFTER_RE = re.compile(r"(?:retry|try again).*?(\d+(?:\.\d+)?)\s*(ms|s|sec|second)", re.IGNORECASE)
+
+
+class HamsaRateLimiter:
+    def __init__(self, rate: float, burst: float, min_rate: float, max_rate: float,
+                 increase: float = 0.1, decrease: float = 0.5):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = burst
+        self._updated = time.monotonic()
+        self._lock = None
+        self._lock_loop = None
+        self.waiting = 0
+        self.granted = {"stt": 0, "tts": 0}
+        self.delayed = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.successes = 0
+        self.rate_limited = 0
+        self.last_rate_limited = None
+
+    def _get_lock(self):
+        # asyncio.Lock binds to the loop it is first used on
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, kind: str) -> float:
+        """Wait for a request slot. Returns the time spent waiting in ms."""
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._get_lock():
+                while True:
+                    self._refill()
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+        waited = (time.monotonic() - start) * 1000
+        self.granted[kind] = self.granted.get(kind, 0) + 1
+        if waited >= 1:
+            self.delayed += 1
+            self.total_wait_ms += waited
+            self.max_wait_ms = max(self.max_wait_ms, waited)
+        return waited
+
+    def on_success(self):
+        """Additive increase after a request completed normally."""
+        self.successes += 1
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_rate_limited(self, retry_after: float = None):
+        """Multiplicative decrease and drain the bucket after a throttled request."""
+        self._refill()
+        self.rate_limited += 1
+        self.last_rate_limited = time.time()
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        # Negative tokens = nobody is let through until the debt is paid back
+        pause = retry_after if retry_after is not None else 1 / self.rate
+        self.tokens = min(self.tokens, 0) - pause * self.rate
+
+    def observe_error(self, message: str) -> bool:
+        """Feed a Hamsa error message; returns True if it was a rate limit."""
+        if not message or not _RATE_LIMIT_RE.search(message):
+            return False
+        retry_after = None
+        match = _RETRY_AFTER_RE.search(message)
+        if match:
+            retry_after = float(match.group(1))
+            if match.group(2).lower() == "ms":
+                retry_after /= 1000
+        self.on_rate_limited(retry_after)
+        return True
+
+    def snapshot(self) -> dict:
+        # Read-only: the refill is computed here, never written back
+        elapsed = time.monotonic() - self._updated
+        tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        return {
+            "rate_per_s": round(self.rate, 3),
+            "burst": self.burst,
+            "tokens": round(tokens, 3),
+            "waiting": self.waiting,
+            "granted": dict(self.granted),
+            "delayed": self.delayed,
+            "avg_wait_ms": round(self.total_wait_ms / self.delayed, 1) if self.delayed else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 1),
+            "successes": self.successes,
+            "rate_limited": self.rate_limited,
+            "last_rate_limited": self.last_rate_limited,
+        }
+
+
+hamsa_limiter = HamsaRateLimiter(
+    rate=settings.HAMSA_RATE_LIMIT,
+    burst=settings.HAMSA_RATE_BURST,
+    min_rate=settings.HAMSA_RATE_MIN,
+    max_rate=settings.HAMSA_RATE_MAX,
+)
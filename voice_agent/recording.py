@@ -0,0 +1,497 @@
+"""Record-and-replay of real sessions for offline perf regression runs.
+
+A recording captures everything that crosses ``VoiceAgentConsumer``'s
+boundaries (client messages in and out, Hamsa WebSocket frames, raw webhook
+and TTS-stream HTTP bodies) with millisecond offsets from session start.
+Recordings are gzip-compressed NDJSON; each line after the header is a
+compact ``[t_ms, event, conn, payload]`` array. Hamsa connect time and
+the wait for HTTP response headers are kept as well, so a replay
+reproduces upstream latency and not just the streaming that follows it.
+
+Events are handed to a per-session writer thread as they happen, so the
+loop never encodes or buffers them. Audio in client-bound ``tts_chunk``
+messages is not stored again (it is already in ``hamsa_recv`` / the TTS
+HTTP body); only its length is kept. The TTS transport picked for each
+sentence is recorded too, and a replay follows those routes instead of
+asking the live ``tts_selector``.
+
+Recording is opt-in via the ``RECORD_SESSIONS_DIR`` setting. Replay is
+driven by ``python manage.py replay_session <file>``.
+"""
+import asyncio
+import base64
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+
+from .tts_transport import RACE, REST, WS
+
+FORMAT_VERSION = 1
+
+# Event names
+CLIENT_IN = "client_in"      # text frame received from the browser
+CLIENT_OUT = "client_out"    # text frame sent to the browser
+HAMSA_OPEN = "hamsa_open"    # Hamsa WebSocket connected (payload: connect_ms)
+HAMSA_SEND = "hamsa_send"    # frame sent to Hamsa
+HAMSA_RECV = "hamsa_recv"    # frame received from Hamsa
+HAMSA_CLOSE = "hamsa_close"  # Hamsa WebSocket closed by us
+HTTP_OPEN = "http_open"      # streamed HTTP response headers in (payload incl. wait_ms since request)
+HTTP_CHUNK = "http_chunk"    # raw body chunk as yielded by httpx
+HTTP_CLOSE = "http_close"    # streamed HTTP response finished
+TTS_ROUTE = "tts_route"      # TTS transport picked for a sentence (ws / rest / race)
+TTS_FAILOVER = "tts_failover"  # sentence retried on the other TTS transport
+
+
+def _encode(data):
+    if isinstance(data, (bytes, bytearray)):
+        return {"b": base64.b64encode(data).decode("ascii")}
+    return data
+
+
+def _decode(payload):
+    if isinstance(payload, dict) and "b" in payload:
+        return base64.b64decode(payload["b"])
+    return payload
+
+
+_TTS_CHUNK_PREFIX = '{"type": "tts_chunk"'
+
+
+def _elide_audio(text):
+    """Replace the audio of a client-bound tts_chunk message by its length."""
+    if isinstance(text, str) and text.startswith(_TTS_CHUNK_PREFIX):
+        audio = json.loads(text).get("audio_base64", "")
+        return json.dumps({"type": "tts_chunk", "audio_base64_len": len(audio)})
+    return text
+
+
+class SessionRecorder:
+    """Stream boundary events for one consumer to a gzip file from a writer thread."""
+
+    def __init__(self, session_id: str, directory: str):
+        self.session_id = session_id
+        self.path = os.path.join(
+            directory, f"{int(time.time())}-{session_id}.ndjson.gz"
+        )
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self._next_conn = 0
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._writer, name=f"recorder-{session_id}", daemon=True
+        )
+        self._thread.start()
+
+    def record(self, event: str, payload=None, conn: int = 0):
+        if self._closed:
+            return
+        t = round((time.perf_counter() - self._t0) * 1000, 2)
+        self._queue.put((t, event, conn, payload))
+
+    def _new_conn(self) -> int:
+        self._next_conn += 1
+        return self._next_conn
+
+    def wrap_ws(self, ws, connect_ms: float = 0.0):
+        """Wrap a connected Hamsa WebSocket so its frames are recorded.
+
+        ``connect_ms`` is how long connecting (and the init message) took;
+        replay waits as long before handing out the socket.
+        """
+        conn = self._new_conn()
+        self.record(HAMSA_OPEN, {"connect_ms": round(connect_ms, 2)}, conn)
+        return _RecordingWebSocket(ws, self, conn)
+
+    def wrap_http(self, client):
+        """Wrap the shared httpx client so streamed bodies are recorded."""
+        return _RecordingHTTPClient(client, self)
+
+    def _writer(self):
+        header = {
+            "v": FORMAT_VERSION,
+            "session_id": self.session_id,
+            "started": self.started,
+        }
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                t, event, conn, payload = item
+                if event == CLIENT_OUT:
+                    payload = _elide_audio(payload)
+                ev = [t, event, conn, _encode(payload)]
+                f.write(json.dumps(ev, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    async def close(self):
+        """Stop recording and wait for the writer thread to finish the file."""
+        if self._closed:
+            return None
+        self._closed = True
+        self._queue.put(None)
+        await asyncio.to_thread(self._thread.join)
+        return self.path
+
+
+def open_recorder(session_id: str):
+    """Return a SessionRecorder when recording is enabled, else None."""
+    directory = getattr(settings, "RECORD_SESSIONS_DIR", "")
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return SessionRecorder(session_id, directory)
+
+
+class _RecordingWebSocket:
+    """Transparent proxy around a ``websockets`` client connection."""
+
+    def __init__(self, ws, recorder, conn):
+        self._ws = ws
+        self._recorder = recorder
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._ws, name)
+
+    async def send(self, message):
+        self._recorder.record(HAMSA_SEND, message, self._conn)
+        await self._ws.send(message)
+
+    async def recv(self):
+        message = await self._ws.recv()
+        self._recorder.record(HAMSA_RECV, message, self._conn)
+        return message
+
+    async def close(self):
+        self._recorder.record(HAMSA_CLOSE, conn=self._conn)
+        await self._ws.close()
+
+
+class _RecordingHTTPClient:
+    """Proxy for ``httpx.AsyncClient.stream`` that records response bodies."""
+
+    def __init__(self, client, recorder):
+        self._client = client
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def stream(self, method, url, **kwargs):
+        return _RecordingStream(
+            self._client.stream(method, url, **kwargs), self._recorder, method, url
+        )
+
+
+class _RecordingStream:
+    def __init__(self, ctx, recorder, method, url):
+        self._ctx = ctx
+        self._recorder = recorder
+        self._method = method
+        self._url = str(url)
+        self._conn = recorder._new_conn()
+
+    async def __aenter__(self):
+        start = time.perf_counter()
+        response = await self._ctx.__aenter__()
+        self._recorder.record(HTTP_OPEN, {
+            "method": self._method,
+            "url": self._url,
+            "status": response.status_code,
+            "headers": dict(response.headers),
+            "wait_ms": round((time.perf_counter() - start) * 1000, 2),
+        }, self._conn)
+        return _RecordingResponse(response, self._recorder, self._conn)
+
+    async def __aexit__(self, *exc):
+        self._recorder.record(HTTP_CLOSE, conn=self._conn)
+        return await self._ctx.__aexit__(*exc)
+
+
+class _RecordingResponse:
+    def __init__(self, response, recorder, conn):
+        self._response = response
+        self._recorder = recorder
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    async def aiter_text(self, *args, **kwargs):
+        async for chunk in self._response.aiter_text(*args, **kwargs):
+            self._recorder.record(HTTP_CHUNK, chunk, self._conn)
+            yield chunk
+
+    async def aiter_bytes(self, *args, **kwargs):
+        async for chunk in self._response.aiter_bytes(*args, **kwargs):
+            self._recorder.record(HTTP_CHUNK, chunk, self._conn)
+            yield chunk
+
+    async def aread(self):
+        body = await self._response.aread()
+        self._recorder.record(HTTP_CHUNK, body, self._conn)
+        return body
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+def load_recording(path: str):
+    """Read a recording file, return (header, events) with payloads decoded."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("v") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported recording version: {header.get('v')}")
+        events = []
+        for line in f:
+            t, event, conn, payload = json.loads(line)
+            events.append((t, event, conn, _decode(payload)))
+    return header, events
+
+
+class _Replayer:
+    """Shared clock and per-connection event streams for one replay run."""
+
+    def __init__(self, events, speed: float):
+        self.events = events
+        self.speed = speed
+        self._t0 = None
+        self._hamsa_conns = []
+        self._http_conns = []
+        by_conn = {}
+        for ev in events:
+            t, event, conn, _ = ev
+            if event == HAMSA_OPEN:
+                self._hamsa_conns.append(conn)
+            elif event == HTTP_OPEN:
+                self._http_conns.append(conn)
+            if conn:
+                by_conn.setdefault(conn, []).append(ev)
+        self.by_conn = by_conn
+
+    def start(self):
+        self._t0 = time.perf_counter()
+
+    def now_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    async def sleep(self, ms: float):
+        if self.speed > 0 and ms > 0:
+            await asyncio.sleep(ms / 1000 / self.speed)
+
+    async def sleep_until(self, t_ms: float):
+        if self.speed > 0:
+            await asyncio.sleep(max(0.0, t_ms / self.speed - self.now_ms()) / 1000)
+
+    async def next_hamsa(self):
+        if not self._hamsa_conns:
+            raise ConnectionError("replay: no more recorded Hamsa connections")
+        events = self.by_conn[self._hamsa_conns.pop(0)]
+        await self.sleep((events[0][3] or {}).get("connect_ms", 0))
+        return _ReplayWebSocket(self, events)
+
+    def next_http(self, url):
+        url = str(url)
+        for i, conn in enumerate(self._http_conns):
+            if self.by_conn[conn][0][3]["url"] == url:
+                del self._http_conns[i]
+                return self.by_conn[conn]
+        raise ConnectionError(f"replay: no recorded HTTP exchange for {url}")
+
+
+class _ReplaySelector:
+    """Stands in for ``tts_selector`` so a replay takes the recorded TTS routes.
+
+    Routes are handed out in recorded order: ``choose`` for a sentence,
+    ``alternative`` for a recorded failover or race, and ``mode`` reads
+    ``"auto"`` only while the next recorded route is a race. Outcomes are
+    not recorded, so a replay never changes the process-wide transport
+    statistics.
+    """
+
+    def __init__(self, events):
+        self._routes = [
+            (event, payload) for _, event, _, payload in events
+            if event in (TTS_ROUTE, TTS_FAILOVER)
+        ]
+
+    def _peek(self):
+        return self._routes[0] if self._routes else (None, None)
+
+    @property
+    def mode(self):
+        return "auto" if self._peek() == (TTS_ROUTE, RACE) else "replay"
+
+    def choose(self):
+        event, route = self._peek()
+        if event != TTS_ROUTE:
+            # Recordings made before route events only used TTS over WebSocket
+            return WS
+        self._routes.pop(0)
+        return route
+
+    def alternative(self, name):
+        event, route = self._peek()
+        if (event, route) == (TTS_ROUTE, RACE):
+            self._routes.pop(0)
+            return REST if name == WS else WS
+        if event == TTS_FAILOVER:
+            self._routes.pop(0)
+            return route
+        return None
+
+    def record(self, name, ttfa_ms, ok):
+        pass
+
+
+class _ReplayWebSocket:
+    """Plays back the server side of one recorded Hamsa connection.
+
+    Each received frame is delayed by its recorded gap from the previous
+    event on the same connection, so server latency after our ``send`` is
+    reproduced (scaled by ``speed``).
+    """
+
+    def __init__(self, replayer, events):
+        from websockets.protocol import State
+        self._replayer = replayer
+        self._events = list(events)
+        self._last_t = self._events[0][0]
+        self.state = State.OPEN
+
+    def _advance(self, kinds):
+        while self._events and self._events[0][1] not in kinds:
+            self._last_t = self._events.pop(0)[0]
+
+    async def send(self, message):
+        self._advance((HAMSA_SEND, HAMSA_RECV))
+        if self._events and self._events[0][1] == HAMSA_SEND:
+            self._last_t = self._events.pop(0)[0]
+
+    async def recv(self):
+        self._advance((HAMSA_RECV, HAMSA_SEND))
+        if not self._events or self._events[0][1] != HAMSA_RECV:
+            # Nothing more was received on this socket: behave like a silent peer
+            await asyncio.sleep(3600)
+        t, _, _, payload = self._events.pop(0)
+        await self._replayer.sleep(t - self._last_t)
+        self._last_t = t
+        return payload
+
+    async def close(self):
+        from websockets.protocol import State
+        self.state = State.CLOSED
+
+
+class _ReplayHTTPClient:
+    def __init__(self, replayer):
+        self._replayer = replayer
+
+    def stream(self, method, url, **kwargs):
+        return _ReplayStream(self._replayer, self._replayer.next_http(url))
+
+
+class _ReplayStream:
+    def __init__(self, replayer, events):
+        self._replayer = replayer
+        self._events = events
+
+    async def __aenter__(self):
+        # Time to response headers (webhook / TTS first byte) as recorded
+        await self._replayer.sleep(self._events[0][3].get("wait_ms", 0))
+        return _ReplayResponse(self._replayer, self._events)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _ReplayResponse:
+    def __init__(self, replayer, events):
+        self._replayer = replayer
+        opened = events[0]
+        self.status_code = opened[3]["status"]
+        self.headers = opened[3]["headers"]
+        self._open_t = opened[0]
+        self._chunks = [ev for ev in events if ev[1] == HTTP_CHUNK]
+
+    async def _iter(self):
+        last_t = self._open_t
+        for t, _, _, payload in self._chunks:
+            await self._replayer.sleep(t - last_t)
+            last_t = t
+            yield payload
+
+    async def aiter_text(self, *args, **kwargs):
+        async for chunk in self._iter():
+            yield chunk.decode("utf-8") if isinstance(chunk, bytes) else chunk
+
+    async def aiter_bytes(self, *args, **kwargs):
+        async for chunk in self._iter():
+            yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+    async def aread(self):
+        body = b""
+        async for chunk in self.aiter_bytes():
+            body += chunk
+        return body
+
+
+async def replay(path: str, speed: float = 1.0):
+    """Replay a recording through VoiceAgentConsumer without network access.
+
+    ``speed`` scales the original timing (2.0 = twice as fast, 0 = no delays).
+    Returns ``(recorded_out, replayed_out)`` as lists of ``(t_ms, message)``
+    for the client-bound frames, so callers can diff or benchmark them.
+    """
+    from .consumers import VoiceAgentConsumer
+    from .turnstore import TurnStore
+
+    header, events = load_recording(path)
+    replayer = _Replayer(events, speed)
+    replayed_out = []
+
+    class ReplayConsumer(VoiceAgentConsumer):
+        tts_selector = _ReplaySelector(events)
+        turn_store = TurnStore("")  # disabled: replayed turns are not stored
+
+        def __init__(self):
+            self.scope = {"url_route": {"kwargs": {"session_id": header["session_id"]}}}
+
+        def _open_recorder(self):
+            return None  # never re-record a replay
+
+        def get_http_client(self):
+            return _ReplayHTTPClient(replayer)
+
+        async def _connect_hamsa_ws(self):
+            return await replayer.next_hamsa()
+
+        async def accept(self, subprotocol=None, headers=None):
+            pass
+
+        async def send(self, text_data=None, bytes_data=None, close=False):
+            replayed_out.append((round(replayer.now_ms(), 2), text_data))
+
+    consumer = ReplayConsumer()
+    replayer.start()
+    await consumer.connect()
+
+    for t, event, _, payload in events:
+        if event == CLIENT_IN:
+            await replayer.sleep_until(t)
+            await consumer.receive(text_data=payload)
+
+    while consumer.tasks:
+        await asyncio.gather(*list(consumer.tasks), return_exceptions=True)
+    await consumer.disconnect(1000)
+
+    recorded_out = [(t, payload) for t, event, _, payload in events if event == CLIENT_OUT]
+    return recorded_out, replayed_out
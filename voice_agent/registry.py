@@ -0,0 +1,86 @@
+"""Registry of live VoiceAgentConsumer instances for the debug endpoint.
+
+Consumers add themselves on connect and keep a few plain attributes up to
+date (stage, stage start, current sentence queue, TTS byte count); all
+aggregation happens only when a snapshot is requested, so the hot path
+pays nothing beyond attribute assignments.
+"""
+import time
+import weakref
+
+_live = weakref.WeakSet()
+
+
+def register(consumer):
+    _live.add(consumer)
+
+
+def unregister(consumer):
+    _live.discard(consumer)
+
+
+def _socket_state(ws):
+    if ws is None:
+        return None
+    state = getattr(ws, "state", None)
+    return getattr(state, "name", str(state)).lower() if state is not None else "unknown"
+
+
+def _task_info(task):
+    coro = task.get_coro()
+    return {
+        "name": task.get_name(),
+        "coro": getattr(coro, "__qualname__", repr(coro)),
+        "done": task.done(),
+    }
+
+
+def session_snapshot(consumer, now: float) -> dict:
+    sentence_q = getattr(consumer, "sentence_q", None)
+    return {
+        "session_id": consumer.session_id,
+        "connected_s": round(now - consumer.connected_at, 1),
+        "stage": consumer.stage,
+        "stage_elapsed_ms": round((now - consumer.stage_started) * 1000),
+        "turns": consumer.turns,
+        "queued_sentences": sentence_q.qsize() if sentence_q is not None else 0,
+        "stt_socket": _socket_state(consumer.stt_ws),
+        "tts_socket": _socket_state(consumer.tts_ws),
+        "tts_bytes": consumer.tts_bytes,
+        "tts_chunks": consumer.tts_chunks,
+        "tasks": [_task_info(t) for t in list(consumer.tasks)],
+    }
+
+
+def _http_pool_snapshot(client):
+    """Connection usage of the shared httpx client (httpcore internals, best effort)."""
+    if client is None:
+        return {"created": False}
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    return {
+        "created": True,
+        "connections": len(connections),
+        "idle": sum(1 for c in connections if c.is_idle()),
+        "http2": sum(1 for c in connections if "HTTP/2" in repr(c)),
+        "pending_requests": len(getattr(pool, "_requests", [])),
+        "max_connections": getattr(pool, "_max_connections", None),
+    }
+
+
+def snapshot() -> dict:
+    from .consumers import VoiceAgentConsumer
+    from .ratelimit import hamsa_limiter
+
+    now = time.monotonic()
+    sessions = [session_snapshot(c, now) for c in list(_live)]
+    open_states = ("open", "connecting")
+    return {
+        "sessions": sorted(sessions, key=lambda s: -s["connected_s"]),
+        "http_pool": _http_pool_snapshot(VoiceAgentConsumer._http_client),
+        "hamsa": {
+            "open_stt_sockets": sum(1 for s in sessions if s["stt_socket"] in open_states),
+            "open_tts_sockets": sum(1 for s in sessions if s["tts_socket"] in open_states),
+            "waiting_for_rate_limit": hamsa_limiter.waiting,
+        },
+    }
@@ -1,3 +1,693 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from . import consumers, loopmon, recording, registry, tracking, views
+from .consumers import TTS_ERROR, TTS_NETWORK, VoiceAgentConsumer
+from .ratelimit import HamsaRateLimiter
+from .recording import TTS_FAILOVER, TTS_ROUTE, _ReplaySelector
+from .tracking import TrackingStore, normalize_phone, normalize_waybill
+from .tts_transport import CLOSED, HALF_OPEN, OPEN, RACE, REST, WS, TTSTransportSelector
+from .turnstore import TurnStore
+
+
+def _limiter(**kwargs):
+    options = {"rate": 4.0, "burst": 4.0, "min_rate": 0.5, "max_rate": 10.0}
+    options.update(kwargs)
+    return HamsaRateLimiter(**options)
+
+
+class HamsaRateLimiterTests(SimpleTestCase):
+    def test_success_increases_rate_up_to_max(self):
+        limiter = _limiter(rate=9.95)
+        limiter.on_success()
+        self.assertAlmostEqual(limiter.rate, 10.0)
+        limiter.on_success()
+        self.assertEqual(limiter.rate, 10.0)
+        self.assertEqual(limiter.successes, 2)
+
+    def test_rate_limited_halves_rate_and_drains_bucket(self):
+        limiter = _limiter()
+        limiter.on_rate_limited()
+        self.assertEqual(limiter.rate, 2.0)
+        self.assertLess(limiter.tokens, 0)
+        self.assertEqual(limiter.rate_limited, 1)
+        for _ in range(5):
+            limiter.on_rate_limited()
+        self.assertEqual(limiter.rate, 0.5)
+
+    def test_retry_after_sets_pause(self):
+        limiter = _limiter()
+        limiter.on_rate_limited(retry_after=3)
+        # 3s of debt at the decreased rate of 2/s
+        self.assertAlmostEqual(limiter.tokens, -6.0, places=1)
+
+    def test_observe_error_parsing(self):
+        limiter = _limiter()
+        with mock.patch.object(limiter, "on_rate_limited") as on_rate_limited:
+            self.assertFalse(limiter.observe_error(""))
+            self.assertFalse(limiter.observe_error("invalid speaker"))
+            on_rate_limited.assert_not_called()
+
+            self.assertTrue(limiter.observe_error("Too many requests"))
+            on_rate_limited.assert_called_with(None)
+            self.assertTrue(limiter.observe_error("Rate limit exceeded, retry after 2 seconds"))
+            on_rate_limited.assert_called_with(2.0)
+            self.assertTrue(limiter.observe_error("quota reached, try again in 500ms"))
+            on_rate_limited.assert_called_with(0.5)
+
+    def test_snapshot_does_not_mutate(self):
+        limiter = _limiter()
+        limiter.tokens = 1.0
+        limiter._updated -= 0.5
+        before = (limiter.tokens, limiter._updated)
+        snapshot = limiter.snapshot()
+        self.assertEqual((limiter.tokens, limiter._updated), before)
+        self.assertAlmostEqual(snapshot["tokens"], 3.0, places=1)
+
+    def test_acquire_paces_after_burst(self):
+        limiter = _limiter(rate=20.0, burst=1.0)
+
+        async def run():
+            await limiter.acquire("tts")
+            return await limiter.acquire("tts")
+
+        waited = asyncio.run(run())
+        self.assertGreater(waited, 20)
+        self.assertEqual(limiter.granted["tts"], 2)
+
+
+class TTSWebSocketRetryTests(SimpleTestCase):
+    """_call_tts_ws only treats a completed short response as throttling."""
+
+    def _call(self, results):
+        consumer = VoiceAgentConsumer()
+        consumer.tts_selector = TTSTransportSelector()
+        consumer._do_tts_request = mock.AsyncMock(side_effect=results)
+        limiter = _limiter()
+        with mock.patch.object(consumers, "hamsa_limiter", limiter):
+            total_bytes, _ = asyncio.run(consumer._call_tts_ws("مرحبا"))
+        return limiter, total_bytes
+
+    def test_stub_counts_as_rate_limited(self):
+        limiter, total_bytes = self._call([(640, None, None), (50000, None, None)])
+        self.assertEqual(total_bytes, 50000)
+        self.assertEqual(limiter.rate_limited, 1)
+        self.assertEqual(limiter.successes, 1)
+
+    def test_observed_error_is_not_counted_twice(self):
+        limiter, _ = self._call([(0, None, TTS_ERROR), (50000, None, None)])
+        self.assertEqual(limiter.rate_limited, 0)
+
+    def test_network_failures_do_not_lower_rate(self):
+        limiter, total_bytes = self._call([(0, None, TTS_NETWORK)] * 3)
+        self.assertEqual(total_bytes, 0)
+        self.assertEqual(limiter.rate_limited, 0)
+        self.assertEqual(limiter.rate, 4.0)
+
+
+class TTSTransportSelectorTests(SimpleTestCase):
+    def test_breaker_open_half_open_closed(self):
+        selector = TTSTransportSelector(failure_threshold=2, cooldown=30.0)
+        ws = selector.transports[WS]
+        with mock.patch("voice_agent.tts_transport.time.monotonic", return_value=100.0):
+            selector.record(WS, None, False)
+            self.assertEqual(ws.state, CLOSED)
+            selector.record(WS, None, False)
+            self.assertEqual(ws.state, OPEN)
+            self.assertEqual(selector.choose(), REST)
+            self.assertIsNone(selector.alternative(REST))
+
+        with mock.patch("voice_agent.tts_transport.time.monotonic", return_value=131.0):
+            self.assertEqual(selector.alternative(REST), WS)
+            self.assertEqual(ws.state, HALF_OPEN)
+            # Only one trial at a time
+            self.assertIsNone(selector.alternative(REST))
+            self.assertEqual(selector.choose(), REST)
+            # A failed trial reopens the breaker straight away
+            selector.record(WS, None, False)
+            self.assertEqual(ws.state, OPEN)
+            self.assertEqual(ws.trips, 2)
+
+        with mock.patch("voice_agent.tts_transport.time.monotonic", return_value=162.0):
+            self.assertEqual(selector.alternative(REST), WS)
+            selector.record(WS, 250.0, True)
+            self.assertEqual(ws.state, CLOSED)
+            self.assertEqual(ws.consecutive_failures, 0)
+            self.assertEqual(ws.ttfa_ms, 250.0)
+
+    def test_unreported_trial_expires(self):
+        selector = TTSTransportSelector(failure_threshold=1, cooldown=30.0)
+        with mock.patch("voice_agent.tts_transport.time.monotonic", return_value=100.0):
+            selector.record(WS, None, False)
+        with mock.patch("voice_agent.tts_transport.time.monotonic", return_value=131.0):
+            self.assertEqual(selector.alternative(REST), WS)
+            self.assertTrue(selector.snapshot()["transports"][WS]["trial_in_flight"])
+        with mock.patch("voice_agent.tts_transport.time.monotonic", return_value=150.0):
+            self.assertIsNone(selector.alternative(REST))
+        with mock.patch("voice_agent.tts_transport.time.monotonic", return_value=161.0):
+            self.assertEqual(selector.alternative(REST), WS)
+
+    def test_prefers_lower_failure_weighted_latency(self):
+        selector = TTSTransportSelector(explore_every=1000)
+        selector.record(WS, 400.0, True)
+        selector.record(REST, 200.0, True)
+        self.assertEqual(selector.choose(), REST)
+
+    def test_pinned_mode_has_no_alternative(self):
+        selector = TTSTransportSelector(mode=REST)
+        self.assertEqual(selector.choose(), REST)
+        self.assertIsNone(selector.alternative(REST))
+
+
+class _FakeTTSStream:
+    """REST TTS response streaming the given chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.status_code = 200
+        self.headers = {}
+
+    def stream(self, method, url, **kwargs):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def aiter_bytes(self, chunk_size=None):
+        for chunk in self.chunks:
+            yield chunk
+
+
+class TTSRaceTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(consumers, "hamsa_limiter", _limiter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.consumer = VoiceAgentConsumer()
+        self.consumer.tts_selector = TTSTransportSelector()
+        self.consumer.tts_bytes = self.consumer.tts_chunks = 0
+        self.consumer.send = mock.AsyncMock()
+
+    def _stream(self, chunks, claim):
+        self.consumer.get_http_client = lambda: _FakeTTSStream(chunks)
+        return asyncio.run(self.consumer._call_tts_stream("مرحبا", claim))
+
+    def test_rest_holds_audio_until_usable(self):
+        claims = []
+
+        def claim(name):
+            claims.append((name, self.consumer.send.await_count))
+            return True
+
+        total_bytes, first_audio_at = self._stream([b"\x01" * 8192] * 3, claim)
+        self.assertEqual(total_bytes, 3 * 8192)
+        self.assertIsNotNone(first_audio_at)
+        # Claimed once, with the second chunk, before anything was sent
+        self.assertEqual(claims, [(REST, 0)])
+        self.assertEqual(self.consumer.send.await_count, 3)
+
+    def test_rest_stub_does_not_claim(self):
+        claim = mock.Mock(return_value=True)
+        total_bytes, first_audio_at = self._stream([b"\x01" * 640], claim)
+        self.assertEqual(total_bytes, 640)
+        self.assertIsNone(first_audio_at)
+        claim.assert_not_called()
+        self.consumer.send.assert_not_awaited()
+
+    def test_race_without_winner_retries_sentence(self):
+        self.consumer._run_tts_transport = mock.AsyncMock(return_value=(640, None))
+        self.consumer._synthesize = mock.AsyncMock(return_value=123.0)
+        self.assertEqual(asyncio.run(self.consumer._race_tts("مرحبا")), 123.0)
+        self.consumer._synthesize.assert_awaited_once_with("مرحبا")
+
+
+class ReplaySelectorTests(SimpleTestCase):
+    def test_follows_recorded_routes(self):
+        selector = _ReplaySelector([
+            (0, TTS_ROUTE, 0, RACE),
+            (5, TTS_ROUTE, 0, WS),
+            (9, TTS_FAILOVER, 0, REST),
+            (20, TTS_ROUTE, 0, REST),
+        ])
+        self.assertEqual(selector.mode, "auto")
+        self.assertEqual(selector.alternative(WS), REST)
+        self.assertNotEqual(selector.mode, "auto")
+        self.assertEqual(selector.choose(), WS)
+        self.assertEqual(selector.alternative(WS), REST)
+        self.assertEqual(selector.choose(), REST)
+        self.assertIsNone(selector.alternative(REST))
+
+    def test_recordings_without_routes_use_websocket(self):
+        selector = _ReplaySelector([])
+        self.assertNotEqual(selector.mode, "auto")
+        self.assertEqual(selector.choose(), WS)
+        self.assertIsNone(selector.alternative(WS))
+
+
+class TurnStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "turns.sqlite3")
+
+    def test_queries_before_first_write_are_empty(self):
+        store = TurnStore(self.path)
+        self.assertEqual(store.session_history("s1"), [])
+        self.assertEqual(store.latency_percentiles(60)["total_ms"]["count"], 0)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_write_behind_and_percentiles(self):
+        store = TurnStore(self.path, flush_interval=0.05)
+        now = time.time()
+        for i in range(1, 11):
+            store.enqueue({"session_id": "s1", "ts": now + i, "status": "ok", "total_ms": i * 100.0})
+        store.enqueue({"session_id": "s2", "ts": now, "status": "error"})
+        store.close()
+        self.assertEqual(store.written, 11)
+        history = store.session_history("s1", limit=3)
+        self.assertEqual([t["total_ms"] for t in history], [800.0, 900.0, 1000.0])
+        total = store.latency_percentiles(60)["total_ms"]
+        self.assertEqual((total["count"], total["p50"], total["p90"]), (10, 500.0, 900.0))
+
+    def test_unopenable_database_marks_store_failed(self):
+        store = TurnStore(os.path.join(self.path, "missing-dir", "turns.sqlite3"))
+        with self.assertLogs("voice_agent.turnstore", "ERROR"):
+            store.enqueue({"session_id": "s1", "ts": 0, "status": "ok"})
+            store._thread.join(5)
+        store.enqueue({"session_id": "s1", "ts": 1, "status": "ok"})
+        stats = store.stats()
+        self.assertFalse(stats["healthy"])
+        self.assertEqual((stats["errors"], stats["written"], stats["queued"]), (1, 0, 0))
+        self.assertEqual(stats["dropped"], 2)
+        self.assertIn("OperationalError", stats["last_error"])
+
+    def test_disabled_store_ignores_turns(self):
+        store = TurnStore("")
+        store.enqueue({"session_id": "s1", "ts": 0, "status": "ok"})
+        self.assertIsNone(store._thread)
+        self.assertEqual(store.enqueued, 0)
+
+
+@override_settings(DEBUG_TOKEN="secret")
+class TurnViewTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory(headers={"X-Debug-Token": "secret"})
+        patcher = mock.patch.object(views, "turn_store", TurnStore("/nonexistent/turns.sqlite3"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_requires_debug_token(self):
+        request = RequestFactory().get("/turns/latency/")
+        self.assertEqual(views.turn_latency(request).status_code, 403)
+        self.assertEqual(views.session_turns(request, "s1").status_code, 403)
+
+    def test_rejects_bad_parameters(self):
+        for window in ("abc", "-5", "0", "nan", "inf"):
+            request = self.factory.get("/turns/latency/", {"window": window})
+            self.assertEqual(views.turn_latency(request).status_code, 400, window)
+        for limit in ("abc", "-1", "0", "1.5"):
+            request = self.factory.get("/turns/s1/", {"limit": limit})
+            self.assertEqual(views.session_turns(request, "s1").status_code, 400, limit)
+
+    def test_valid_parameters(self):
+        request = self.factory.get("/turns/latency/", {"window": "60"})
+        self.assertEqual(views.turn_latency(request).status_code, 200)
+        request = self.factory.get("/turns/s1/", {"limit": "5000"})
+        self.assertEqual(views.session_turns(request, "s1").status_code, 200)
+
+
+@override_settings(DEBUG_TOKEN="secret")
+class DebugSessionsViewTests(SimpleTestCase):
+    def test_lists_live_sessions(self):
+        consumer = VoiceAgentConsumer()
+        consumer.session_id = "s1"
+        consumer.connected_at = consumer.stage_started = time.monotonic()
+        consumer.stage = "tts"
+        consumer.turns = 2
+        consumer.tasks = set()
+        consumer.sentence_q = asyncio.Queue()
+        consumer.stt_ws = consumer.tts_ws = None
+        consumer.tts_bytes = consumer.tts_chunks = 0
+        registry.register(consumer)
+        self.addCleanup(registry.unregister, consumer)
+
+        request = RequestFactory(headers={"X-Debug-Token": "secret"}).get("/debug/sessions/")
+        response = asyncio.run(views.debug_sessions(request))
+        self.assertEqual(response.status_code, 200)
+        sessions = json.loads(response.content)["sessions"]
+        self.assertEqual([(s["session_id"], s["stage"], s["turns"]) for s in sessions], [("s1", "tts", 2)])
+
+
+class LoopProfilerTests(SimpleTestCase):
+    def setUp(self):
+        # Stall detection off: profiling must still work
+        patcher = mock.patch.object(loopmon, "loop_monitor", loopmon.LoopMonitor(50, 0))
+        self.monitor = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_first_request_records_loop_thread_without_stall_monitor(self):
+        app = mock.AsyncMock()
+        asyncio.run(loopmon.monitor_loop(app)({"type": "http"}, None, None))
+        app.assert_awaited_once()
+        self.assertIsNotNone(self.monitor.loop_thread_id)
+        self.assertFalse(self.monitor.started)
+
+    def test_unwritable_profile_dir_does_not_leave_lock_held(self):
+        self.monitor.loop_thread_id = 1
+        missing = os.path.join(tempfile.gettempdir(), "no-such-dir", "x")
+        with mock.patch("voice_agent.loopmon.os.makedirs", side_effect=PermissionError("read-only")):
+            with override_settings(PROFILE_DIR=missing):
+                with self.assertRaises(OSError):
+                    loopmon.start_profile(1)
+        self.assertFalse(loopmon._profile_lock.locked())
+
+    def test_sigusr2_before_loop_start_does_not_kill_process(self):
+        import signal
+
+        previous = signal.getsignal(signal.SIGUSR2)
+        self.addCleanup(signal.signal, signal.SIGUSR2, previous)
+        self.assertTrue(loopmon.install_signal_handler())
+        with mock.patch.object(loopmon, "start_profile", return_value=None) as start_profile:
+            os.kill(os.getpid(), signal.SIGUSR2)
+            time.sleep(0.05)
+        start_profile.assert_called_once()
+
+
+@override_settings(DEBUG_TOKEN="secret")
+class DebugProfileViewTests(SimpleTestCase):
+    def test_rejects_bad_seconds(self):
+        factory = RequestFactory(headers={"X-Debug-Token": "secret"})
+        with mock.patch.object(views, "start_profile") as start_profile:
+            for seconds in ("abc", "-1", "0", "nan", "inf"):
+                response = views.debug_profile(factory.get("/debug/profile/", {"seconds": seconds}))
+                self.assertEqual(response.status_code, 400, seconds)
+            start_profile.assert_not_called()
+
+            start_profile.return_value = "/tmp/loop.folded"
+            response = views.debug_profile(factory.get("/debug/profile/", {"seconds": "900"}))
+            self.assertEqual(response.status_code, 202)
+            start_profile.assert_called_once_with(300)
+
+            start_profile.side_effect = PermissionError("read-only")
+            response = views.debug_profile(factory.get("/debug/profile/"))
+            self.assertEqual(response.status_code, 503)
+
+
+class TrackingNormalizationTests(SimpleTestCase):
+    def test_normalize_phone(self):
+        for phone in (
+            "+966 50 123 4567",
+            "00966501234567",
+            "0501234567",
+            "501234567",
+            "٠٥٠١٢٣٤٥٦٧",
+            "+٩٦٦٥٠١٢٣٤٥٦٧",
+            "۰۵۰-۱۲۳-۴۵۶۷",
+        ):
+            self.assertEqual(normalize_phone(phone), "501234567", phone)
+
+    def test_normalize_phone_keeps_short_numbers(self):
+        # Too short to carry a 966 country code
+        self.assertEqual(normalize_phone("966123"), "966123")
+
+    def test_normalize_waybill(self):
+        self.assertEqual(normalize_waybill(" ab-12/34_5 "), "AB12345")
+        self.assertEqual(normalize_waybill("ab ١٢٣٤"), "AB1234")
+        self.assertEqual(normalize_waybill(12345), "12345")
+
+
+class TrackingStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "tracking.ndjson")
+
+    def _write(self, lines, mode="w"):
+        with open(self.path, mode, encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in lines)
+
+    @staticmethod
+    def _row(waybill, phone, status):
+        return json.dumps({"waybillNumber": waybill, "senderPhone": phone, "status": status})
+
+    def test_upsert_by_waybill(self):
+        self._write([
+            self._row("WB-1", "0501234567", "created"),
+            self._row("WB-2", "0501234567", "created"),
+            self._row("wb1", "0559999999", "delivered"),
+        ])
+        store = TrackingStore(self.path)
+        store.reload()
+        self.assertEqual(store.by_waybill("WB1")[0]["status"], "delivered")
+        self.assertEqual([r["waybillNumber"] for r in store.by_phone("+966501234567")], ["WB-2"])
+        self.assertEqual(len(store.by_phone("0559999999")), 1)
+        self.assertEqual(store.stats()["records"], 2)
+
+    def test_append_reloads_incrementally(self):
+        self._write([self._row("WB-1", "0501234567", "created")])
+        store = TrackingStore(self.path)
+        store.reload()
+        self._write([self._row("WB-1", "0501234567", "delivered"), self._row("WB-3", "", "new")], "a")
+        store.reload()
+        self.assertEqual((store.full_reloads, store.incremental_reloads), (1, 1))
+        self.assertEqual(store.by_waybill("WB-1")[0]["status"], "delivered")
+        self.assertEqual(len(store.by_phone("0501234567")), 1)
+        self.assertTrue(store.by_waybill("WB-3"))
+
+    def test_partial_line_waits_for_newline(self):
+        self._write([self._row("WB-1", "", "created")])
+        store = TrackingStore(self.path)
+        store.reload()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(self._row("WB-2", "", "created")[:10])
+        store.reload()
+        self.assertFalse(store.by_waybill("WB-2"))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(self._row("WB-2", "", "created")[10:] + "\n")
+        store.reload()
+        self.assertTrue(store.by_waybill("WB-2"))
+        self.assertEqual(store.full_reloads, 1)
+
+    def test_rewritten_prefix_forces_full_reload(self):
+        self._write([self._row("WB-1", "", "created")])
+        store = TrackingStore(self.path)
+        store.reload()
+        # Same inode, larger file, but the consumed line changed
+        with open(self.path, "r+", encoding="utf-8") as f:
+            f.write(self._row("WB-9", "", "created") + "\n" + self._row("WB-2", "", "created") + "\n")
+        store.reload()
+        self.assertEqual((store.full_reloads, store.incremental_reloads), (2, 0))
+        self.assertFalse(store.by_waybill("WB-1"))
+        self.assertTrue(store.by_waybill("WB-9"))
+
+    def test_bad_lines_are_skipped(self):
+        self._write([self._row("WB-1", "", "created"), "{not json", "[1, 2]", self._row("WB-2", "", "created")])
+        store = TrackingStore(self.path)
+        store.reload()
+        self.assertEqual(store.stats()["records"], 2)
+        self.assertEqual(store.bad_lines, 2)
+
+    def test_failed_reload_keeps_previous_data(self):
+        json_path = os.path.join(os.path.dirname(self.path), "tracking.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump([{"waybillNumber": "WB-1"}], f)
+        store = TrackingStore(json_path, reload_interval=0)
+        store.reload()
+        with open(json_path, "w", encoding="utf-8") as f:
+            f.write("[{broken")
+        with self.assertLogs("voice_agent.tracking", "ERROR"):
+            store.reload()
+        self.assertTrue(store.by_waybill("WB-1"))
+        self.assertEqual(store.reload_errors, 1)
+        self.assertFalse(store.needs_reload())
+
+
+@override_settings(TOOL_TOKEN="tool")
+class TrackingLookupViewTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "tracking.ndjson")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"waybillNumber": "WB-1", "senderPhone": "0501234567"}) + "\n")
+
+    def _lookup(self, store, token="tool", **params):
+        factory = RequestFactory(headers={"Authorization": f"Bearer {token}"} if token else {})
+        with mock.patch.object(views, "tracking_store", store):
+            return asyncio.run(views.tracking_lookup(factory.get("/tools/tracking/", params)))
+
+    @override_settings(TOOL_TOKEN="", DEBUG=True)
+    def test_refused_without_tool_token(self):
+        store = TrackingStore(self.path)
+        self.assertEqual(self._lookup(store, token=None, phone_number="0501234567").status_code, 403)
+        self.assertEqual(self._lookup(store, token="", phone_number="0501234567").status_code, 403)
+
+    def test_lookup_waits_for_initial_load(self):
+        store = TrackingStore(self.path)
+        read_file = tracking._read_file
+        started = threading.Event()
+
+        def slow_read(path):
+            started.set()
+            time.sleep(0.2)
+            return read_file(path)
+
+        with mock.patch.object(tracking, "_read_file", slow_read):
+            store.load_in_background()
+            started.wait(5)
+            response = self._lookup(store, waybill_number="WB-1")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.content)["found"])
+        self.assertEqual(store.full_reloads, 1)
+
+    def test_failed_initial_load_is_not_reported_as_not_found(self):
+        store = TrackingStore(self.path)
+        with mock.patch.object(tracking, "_read_file", side_effect=PermissionError("denied")):
+            with self.assertLogs("voice_agent.tracking", "ERROR"):
+                response = self._lookup(store, waybill_number="WB-1")
+        self.assertEqual(response.status_code, 503)
+
+    def test_rejects_non_object_body(self):
+        request = RequestFactory(headers={"Authorization": "Bearer tool"}).post(
+            "/tools/tracking/", data="[1]", content_type="application/json"
+        )
+        with mock.patch.object(views, "tracking_store", TrackingStore("/nonexistent.ndjson")):
+            response = asyncio.run(views.tracking_lookup(request))
+        self.assertEqual(response.status_code, 400)
+
+
+class _FakeHamsa:
+    """Scripted Hamsa WebSocket: a transcription for STT, two audio frames for TTS."""
+
+    def __init__(self):
+        from websockets.protocol import State
+
+        self.state = State.OPEN
+        self._inbox = asyncio.Queue()
+        self._inbox.put_nowait(json.dumps({"type": "ready"}))
+
+    async def send(self, message):
+        if json.loads(message)["type"] == "stt":
+            self._inbox.put_nowait(json.dumps({"type": "transcription", "payload": {"text": "وين شحنتي"}}))
+            return
+        await asyncio.sleep(0.05)
+        for frame in (b"\x01" * 12000, b"\x02" * 12000, json.dumps({"type": "end"})):
+            self._inbox.put_nowait(frame)
+
+    async def recv(self):
+        if self._inbox.empty():
+            raise asyncio.TimeoutError  # nothing after "end"
+        return self._inbox.get_nowait()
+
+    async def close(self):
+        from websockets.protocol import State
+
+        self.state = State.CLOSED
+
+
+class _FakeWebhook:
+    """Streams an n8n-style NDJSON answer after a fixed time to first byte."""
+
+    TTFB = 0.3
+
+    def stream(self, method, url, **kwargs):
+        return self
+
+    async def __aenter__(self):
+        await asyncio.sleep(self.TTFB)
+        self.status_code = 200
+        self.headers = {}
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def aiter_text(self):
+        for word in ("شحنتك ", "في الطريق."):
+            yield json.dumps({"type": "item", "content": word, "metadata": {"nodeName": "Voice Agent"}}) + "\n"
+
+
+class RecordReplayTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        for patcher in (
+            mock.patch.object(consumers, "hamsa_limiter", _limiter()),
+            mock.patch.object(consumers, "loop_monitor"),
+            mock.patch("websockets.connect", self._connect),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    async def _connect(url, **kwargs):
+        return _FakeHamsa()
+
+    def _record_session(self):
+        directory = self.directory
+
+        class RecordedConsumer(VoiceAgentConsumer):
+            tts_selector = TTSTransportSelector(mode=WS)
+            turn_store = TurnStore("")
+
+            def __init__(self):
+                self.scope = {"url_route": {"kwargs": {"session_id": "rt"}}}
+                self.base_send = mock.AsyncMock()
+
+            def _open_recorder(self):
+                return recording.SessionRecorder(self.session_id, directory)
+
+            def get_http_client(self):
+                return _FakeWebhook()
+
+        async def run():
+            consumer = RecordedConsumer()
+            await consumer.connect()
+            path = consumer.recorder.path
+            await consumer.receive(text_data=json.dumps({"audio_base64": "AAAA"}))
+            while consumer.tasks:
+                await asyncio.gather(*list(consumer.tasks))
+            await consumer.disconnect(1000)
+            return path
+
+        return asyncio.run(run())
+
+    @staticmethod
+    def _frames(out):
+        frames = []
+        for t, text in out:
+            message = json.loads(text)
+            if message["type"] == "tts_chunk":
+                # Recordings keep only the length of the client-bound audio
+                message = {"type": "tts_chunk", "audio_base64_len": (
+                    message.get("audio_base64_len") or len(message["audio_base64"]))}
+            frames.append((t, tuple(sorted(message.items()))))
+        return frames
+
+    def test_round_trip_reproduces_frames_and_timing(self):
+        path = self._record_session()
+        recorded_out, replayed_out = asyncio.run(recording.replay(path, speed=1.0))
+        recorded = self._frames(recorded_out)
+        replayed = self._frames(replayed_out)
+
+        self.assertEqual([f for _, f in replayed], [f for _, f in recorded])
+        kinds = [dict(f)["type"] for _, f in recorded]
+        self.assertEqual(kinds.count("tts_chunk"), 2)
+        self.assertLess(kinds.index("token"), kinds.index("tts_chunk"))
+
+        # The webhook's time to first byte is part of the replayed latency
+        first_token = next(t for t, f in recorded if dict(f)["type"] == "token")
+        replayed_token = next(t for t, f in replayed if dict(f)["type"] == "token")
+        self.assertGreaterEqual(first_token, _FakeWebhook.TTFB * 1000)
+        self.assertGreaterEqual(replayed_token, first_token * 0.8)
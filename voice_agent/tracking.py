@@ -0,0 +1,322 @@
+"""In-process tracking dataset behind the agent's waybill/phone lookup tool.
+
+Replaces the n8n data-table round trip (``LookupByWaybill`` /
+``LookupByPhone``) with hash-index lookups on a dataset loaded from a
+local file (``TRACKING_DATA_PATH``: ``.json`` array, ``.ndjson`` or
+``.csv``). Rows are kept as tuples against one shared column list, with
+one index on ``waybillNumber`` and one on the normalized
+``senderPhone``.
+
+The file is loaded in the background at startup
+(``VoiceAgentConfig.ready``); a lookup that arrives before that load has
+finished waits for it instead of answering from empty indexes. After
+that the file is re-checked at most every ``TRACKING_RELOAD_INTERVAL``
+seconds. An NDJSON file that only grew behind an unchanged last consumed
+line is applied incrementally (new lines are upserted by waybill); any
+other change rebuilds the store and swaps it in. Lines that are not JSON
+objects are skipped and counted, and a reload that fails keeps serving
+the previous data.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+WAYBILL_FIELD = "waybillNumber"
+PHONE_FIELD = "senderPhone"
+
+# Arabic-Indic (U+0660..0669) and Extended Arabic-Indic (U+06F0..06F9) digits
+_DIGITS = str.maketrans(
+    "٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹",
+    "01234567890123456789",
+)
+_NON_DIGIT_RE = re.compile(r"\D")
+_WAYBILL_STRIP_RE = re.compile(r"[\s\-_/]")
+
+
+def normalize_digits(value) -> str:
+    return str(value).translate(_DIGITS)
+
+
+def normalize_phone(value) -> str:
+    """Reduce a phone number to its national significant number.
+
+    ``+966 50 123 4567``, ``00966501234567``, ``0501234567`` and
+    ``٠٥٠١٢٣٤٥٦٧`` all normalize to ``501234567``.
+    """
+    digits = _NON_DIGIT_RE.sub("", normalize_digits(value))
+    if digits.startswith("00"):
+        digits = digits[2:]
+    if digits.startswith("966") and len(digits) > 9:
+        digits = digits[3:]
+    return digits.lstrip("0")
+
+
+def normalize_waybill(value) -> str:
+    return _WAYBILL_STRIP_RE.sub("", normalize_digits(value)).upper()
+
+
+def _is_ndjson(path):
+    return path.endswith((".ndjson", ".jsonl"))
+
+
+def _fingerprint(line: bytes):
+    return len(line), hashlib.sha1(line).digest()
+
+
+def _read_ndjson(path, offset=0):
+    """Read complete lines from ``offset``.
+
+    Returns (records, offset after last newline, fingerprint of the last
+    line read or None, number of bad lines).
+    """
+    records = []
+    last = None
+    bad = 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # partially written line, picked up on the next reload
+            offset += len(line)
+            last = line
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if isinstance(record, dict):
+                records.append(record)
+            else:
+                bad += 1
+    return records, offset, last and _fingerprint(last), bad
+
+
+def _read_file(path):
+    """Read every record from a .csv/.json/.ndjson file.
+
+    Returns (records, offset, fingerprint, bad records) like _read_ndjson.
+    """
+    if _is_ndjson(path):
+        return _read_ndjson(path)
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            return list(csv.DictReader(f)), 0, None, 0
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    data = data.get("data", []) if isinstance(data, dict) else data
+    records = [r for r in data if isinstance(r, dict)]
+    return records, 0, None, len(data) - len(records)
+
+
+class TrackingStore:
+    def __init__(self, path: str, reload_interval: float = 5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        # (columns, column_index, rows, by_waybill, by_phone), swapped as a
+        # whole on full reload so lookups on the loop never see a mix
+        self._data = ([], {}, [], {}, {})
+        self._stat = None
+        self._offset = 0
+        # (length, sha1) of the last consumed NDJSON line; None forces a full reload
+        self._tail = None
+        self._next_check = 0.0
+        self.loaded_at = None
+        self.full_reloads = 0
+        self.incremental_reloads = 0
+        self.bad_lines = 0
+        self.reload_errors = 0
+        self.last_error = None
+        self.lookups = 0
+        self.hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    # Loading
+
+    def _add(self, record, columns, column_index, rows, by_waybill, by_phone):
+        for key in record:
+            if key not in column_index:
+                column_index[key] = len(columns)
+                columns.append(key)
+        row = [None] * len(columns)
+        for key, value in record.items():
+            row[column_index[key]] = value
+        idx = len(rows)
+        rows.append(tuple(row))
+
+        waybill = normalize_waybill(record.get(WAYBILL_FIELD) or "")
+        if waybill:
+            previous = by_waybill.get(waybill)
+            if previous is not None:
+                # Upsert: the newer row replaces the older one in both indexes
+                old_phone = normalize_phone(self._field(rows[previous], PHONE_FIELD, column_index) or "")
+                if old_phone in by_phone:
+                    by_phone[old_phone] = [i for i in by_phone[old_phone] if i != previous]
+            by_waybill[waybill] = idx
+        phone = normalize_phone(record.get(PHONE_FIELD) or "")
+        if phone:
+            by_phone.setdefault(phone, []).append(idx)
+
+    @staticmethod
+    def _field(row, name, column_index):
+        i = column_index.get(name)
+        return row[i] if i is not None and i < len(row) else None
+
+    def _load_full(self):
+        records, offset, tail, bad = _read_file(self.path)
+        data = ([], {}, [], {}, {})
+        for record in records:
+            self._add(record, *data)
+        self._data = data
+        self._offset, self._tail = offset, tail
+        self.bad_lines = bad
+        self.full_reloads += 1
+
+    def _load_appended(self):
+        # Appends in place: rows/columns only grow and index updates are
+        # single dict/list assignments, so concurrent lookups stay consistent
+        records, offset, tail, bad = _read_ndjson(self.path, self._offset)
+        data = self._data
+        for record in records:
+            self._add(record, *data)
+        self._offset, self._tail = offset, tail or self._tail
+        self.bad_lines += bad
+        self.incremental_reloads += 1
+
+    def _prefix_unchanged(self) -> bool:
+        """Whether the last consumed line still ends at ``_offset``."""
+        if self._offset == 0:
+            return True
+        if self._tail is None:
+            return False
+        length, digest = self._tail
+        with open(self.path, "rb") as f:
+            f.seek(self._offset - length)
+            return _fingerprint(f.read(length)) == (length, digest)
+
+    def needs_reload(self) -> bool:
+        """Cheap, rate-limited check whether the data file changed."""
+        now = time.monotonic()
+        if not self.enabled or now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return self._stat is None or (stat.st_mtime_ns, stat.st_size) != (
+            self._stat.st_mtime_ns, self._stat.st_size)
+
+    def reload(self):
+        """Apply file changes: append-only NDJSON growth incrementally, else rebuild.
+
+        Errors are logged and counted; lookups keep using the data loaded
+        before, and the file is not retried until it changes again.
+        """
+        with self._lock:
+            self._reload_logged()
+
+    def ensure_loaded(self):
+        """Load the file unless it was loaded (or tried) already; waits for a load in progress."""
+        if not self.enabled or self.loaded_at is not None:
+            return
+        with self._lock:
+            if self.loaded_at is None and self._stat is None:
+                self._reload_logged()
+
+    def load_in_background(self):
+        """Start the initial load on a daemon thread (called at startup)."""
+        if self.enabled:
+            threading.Thread(target=self.ensure_loaded, name="tracking-load", daemon=True).start()
+
+    def _reload_logged(self):
+        stat = None
+        try:
+            stat = os.stat(self.path)
+            self._reload(stat)
+        except Exception as e:
+            self.reload_errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.exception("tracking store: reload of %s failed", self.path)
+            # Remember the failed version so needs_reload() waits for the
+            # next change, which then gets a full reload
+            self._stat = stat
+            self._tail = None
+
+    def _reload(self, stat):
+        appendable = (
+            self._stat is not None
+            and _is_ndjson(self.path)
+            and stat.st_ino == self._stat.st_ino
+            and stat.st_size > self._stat.st_size
+            and self._prefix_unchanged()
+        )
+        if appendable:
+            self._load_appended()
+        else:
+            self._load_full()
+        self._stat = stat
+        self.loaded_at = time.time()
+
+    # Lookups
+
+    @staticmethod
+    def _record(data, idx):
+        columns, _, rows, _, _ = data
+        row = rows[idx]
+        return {
+            name: row[i] if i < len(row) else None
+            for i, name in enumerate(columns)
+        }
+
+    def by_waybill(self, waybill) -> list:
+        data = self._data
+        self.lookups += 1
+        idx = data[3].get(normalize_waybill(waybill))
+        if idx is None:
+            return []
+        self.hits += 1
+        return [self._record(data, idx)]
+
+    def by_phone(self, phone) -> list:
+        data = self._data
+        self.lookups += 1
+        indexes = data[4].get(normalize_phone(phone), [])
+        if indexes:
+            self.hits += 1
+        return [self._record(data, i) for i in indexes]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "records": len(self._data[3]),
+            "phones": len(self._data[4]),
+            "loaded_at": self.loaded_at,
+            "full_reloads": self.full_reloads,
+            "incremental_reloads": self.incremental_reloads,
+            "bad_lines": self.bad_lines,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error,
+            "lookups": self.lookups,
+            "hits": self.hits,
+        }
+
+
+tracking_store = TrackingStore(
+    settings.TRACKING_DATA_PATH, reload_interval=settings.TRACKING_RELOAD_INTERVAL
+)
@@ -0,0 +1,147 @@
+"""Adaptive choice between Hamsa TTS over WebSocket and REST streaming.
+
+Each transport keeps an exponentially weighted moving average of
+time-to-first-audio and failure rate. Sentences go to the transport with
+the best failure-weighted latency; every ``explore_every``-th sentence
+goes to the other one so its estimate stays fresh. A per-transport
+circuit breaker opens after repeated failures (errors or truncated
+audio), routes everything to the other path for ``cooldown`` seconds,
+then lets a single trial request through (half-open). While that trial
+is outstanding the transport stays unavailable; a trial that never
+reports back (e.g. a cancelled race loser) expires after ``cooldown``.
+"""
+import time
+
+from django.conf import settings
+
+WS = "ws"
+REST = "rest"
+RACE = "race"  # both transports at once, first usable audio wins
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class TransportStats:
+    def __init__(self, name: str, alpha: float, failure_threshold: int, cooldown: float):
+        self.name = name
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.ttfa_ms = None  # EWMA, None until the first successful request
+        self.failure_rate = 0.0  # EWMA of 0/1 outcomes
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = None
+        self.trips = 0
+        self.trial_started = None  # half-open trial handed out, awaiting record()
+        self.last_used = 0.0
+
+    def available(self, now: float) -> bool:
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            return self.trial_started is None or now - self.trial_started >= self.cooldown
+        return self.state == CLOSED
+
+    def use(self, now: float):
+        """Mark the transport as handed out for a request."""
+        self.last_used = now
+        if self.state == HALF_OPEN:
+            self.trial_started = now
+
+    def record(self, ttfa_ms, ok: bool, now: float):
+        self.trial_started = None
+        self.requests += 1
+        self.failure_rate += self.alpha * ((0.0 if ok else 1.0) - self.failure_rate)
+        if ok:
+            if ttfa_ms is not None:
+                if self.ttfa_ms is None:
+                    self.ttfa_ms = ttfa_ms
+                else:
+                    self.ttfa_ms += self.alpha * (ttfa_ms - self.ttfa_ms)
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.trips += 1
+            self.state = OPEN
+            self.opened_at = now
+
+    def score(self) -> float:
+        """Failure-weighted latency; lower is better."""
+        return self.ttfa_ms * (1 + 2 * self.failure_rate)
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "ttfa_ms": round(self.ttfa_ms, 1) if self.ttfa_ms is not None else None,
+            "failure_rate": round(self.failure_rate, 3),
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "trial_in_flight": self.trial_started is not None,
+        }
+
+
+class TTSTransportSelector:
+    def __init__(self, mode: str = "auto", preferred=(WS, REST), explore_every: int = 20,
+                 alpha: float = 0.2, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.mode = mode
+        self.explore_every = explore_every
+        # Insertion order = preference order for unmeasured transports
+        self.transports = {
+            name: TransportStats(name, alpha, failure_threshold, cooldown)
+            for name in preferred
+        }
+        self._choices = 0
+
+    def choose(self) -> str:
+        """Pick the transport for the next sentence."""
+        if self.mode in self.transports:
+            return self.mode
+
+        now = time.monotonic()
+        candidates = [t for t in self.transports.values() if t.available(now)]
+        if not candidates:
+            # Every breaker is open: fall back to the one that opened first
+            candidates = [min(self.transports.values(), key=lambda t: t.opened_at)]
+
+        self._choices += 1
+        measured = [t for t in candidates if t.ttfa_ms is not None]
+        best = min(measured, key=TransportStats.score) if measured else candidates[0]
+        if len(candidates) > 1 and self._choices % self.explore_every == 0:
+            best = min((t for t in candidates if t is not best), key=lambda t: t.last_used)
+
+        best.use(now)
+        return best.name
+
+    def alternative(self, name: str):
+        """Another currently available transport to fail over to, if any."""
+        if self.mode in self.transports:
+            return None
+        now = time.monotonic()
+        for t in self.transports.values():
+            if t.name != name and t.available(now):
+                t.use(now)
+                return t.name
+        return None
+
+    def record(self, name: str, ttfa_ms, ok: bool):
+        self.transports[name].record(ttfa_ms, ok, time.monotonic())
+
+    def snapshot(self) -> dict:
+        return {
+            "mode": self.mode,
+            "transports": {name: t.snapshot() for name, t in self.transports.items()},
+        }
+
+
+tts_selector = TTSTransportSelector(mode=settings.TTS_TRANSPORT)
@@ -0,0 +1,224 @@
+"""Write-behind store for conversation turns and per-stage latencies.
+
+``_run_pipeline`` hands each finished turn to ``turn_store.enqueue``, which
+only does a non-blocking put on a bounded queue (a full queue drops the
+record and bumps a counter). A daemon thread drains the queue and writes
+batches to SQLite in single transactions, with WAL so the query
+endpoints can read while it writes. The writer creates the schema; until
+it has, queries simply return nothing. If the database cannot be opened
+the store marks itself failed and stops accepting turns.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Stage columns, in pipeline order
+STAGES = ("stt_ms", "webhook_ms", "first_audio_ms", "tts_ms", "total_ms")
+
+_COLUMNS = ("session_id", "ts", "status", "transcription", "response") + STAGES
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    status TEXT NOT NULL,
+    transcription TEXT,
+    response TEXT,
+    stt_ms REAL,
+    webhook_ms REAL,
+    first_audio_ms REAL,
+    tts_ms REAL,
+    total_ms REAL
+);
+CREATE INDEX IF NOT EXISTS turns_session_ts ON turns (session_id, ts);
+CREATE INDEX IF NOT EXISTS turns_ts ON turns (ts);
+"""
+
+
+def _connect(path):
+    import sqlite3  # only loaded once the store is used
+
+    conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[rank], 1)
+
+
+class TurnStore:
+    def __init__(self, path: str, max_queue: int = 1000, batch_size: int = 100,
+                 flush_interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+        self.failed = False
+        self.last_error = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def enqueue(self, record: dict):
+        """Queue a turn for writing. Never blocks; drops when the queue is full."""
+        if not self.enabled:
+            return
+        if self.failed:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(tuple(record.get(c) for c in _COLUMNS))
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+        if self.failed:
+            self._drain()  # the writer failed while this record was being queued
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._writer, name="turn-store-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _writer(self):
+        import sqlite3
+
+        try:
+            conn = _connect(self.path)
+            conn.executescript(_SCHEMA)
+        except Exception as e:
+            self._fail(e)
+            logger.exception("turn store: cannot open %s, no turns will be stored", self.path)
+            return
+        insert = (
+            f"INSERT INTO turns ({', '.join(_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in _COLUMNS)})"
+        )
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                if self._stopping:
+                    break
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(insert, batch)
+                self.written += len(batch)
+                self.batches += 1
+            except sqlite3.Error as e:
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.exception("turn store: failed to write %d records", len(batch))
+        conn.close()
+
+    def _fail(self, error):
+        self.failed = True
+        self.errors += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        self._drain()
+
+    def _drain(self):
+        """Drop queued records nobody will write."""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0):
+        """Flush queued records and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "healthy": self.enabled and not self.failed,
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+    # Queries (run on the caller's thread with a short-lived connection)
+
+    def _query(self, sql, params):
+        import sqlite3
+
+        if not os.path.exists(self.path):
+            return []  # nothing written yet
+        conn = _connect(self.path)
+        try:
+            conn.row_factory = sqlite3.Row
+            return conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            if "no such table" in str(e):
+                return []  # writer has not created the schema yet
+            raise
+        finally:
+            conn.close()
+
+    def session_history(self, session_id: str, limit: int = 100) -> list:
+        rows = self._query(
+            "SELECT * FROM turns WHERE session_id = ? ORDER BY ts DESC LIMIT ?",
+            (session_id, limit),
+        )
+        return [dict(row) for row in reversed(rows)]
+
+    def latency_percentiles(self, window_s: float, percentiles=(50, 90, 99)) -> dict:
+        """Per-stage latency percentiles for turns started in the last ``window_s`` seconds."""
+        rows = self._query(
+            f"SELECT {', '.join(STAGES)} FROM turns WHERE ts >= ? AND status = 'ok'",
+            (time.time() - window_s,),
+        )
+        result = {}
+        for stage in STAGES:
+            values = sorted(row[stage] for row in rows if row[stage] is not None)
+            result[stage] = {"count": len(values)}
+            for pct in percentiles:
+                result[stage][f"p{pct}"] = _percentile(values, pct)
+        return result
+
+
+turn_store = TurnStore(settings.TURN_STORE_PATH, max_queue=settings.TURN_STORE_MAX_QUEUE)
@@ -4,4 +4,12 @@ from . import views
 
 urlpatterns = [
     path("", views.voice_agent, name="voice-agent"),
+    path("metrics/hamsa/", views.hamsa_metrics, name="hamsa-metrics"),
+    path("turns/latency/", views.turn_latency, name="turn-latency"),
+    path("turns/<str:session_id>/", views.session_turns, name="session-turns"),
+    path("debug/sessions/", views.debug_sessions, name="debug-sessions"),
+    path("debug/loop/", views.debug_loop, name="debug-loop"),
+    path("debug/profile/", views.debug_profile, name="debug-profile"),
+    path("tools/tracking/", views.tracking_lookup, name="tracking-lookup"),
+    path("tools/tracking/stats/", views.tracking_stats, name="tracking-stats"),
 ]
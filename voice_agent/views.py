@@ -1,5 +1,166 @@
+import asyncio
+import hmac
+import json
+import math
+
+from django.conf import settings
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import registry
+from .loopmon import loop_monitor, start_profile
+from .ratelimit import hamsa_limiter
+from .tracking import tracking_store
+from .tts_transport import tts_selector
+from .turnstore import turn_store
+
 
 def voice_agent(request):
     return render(request, "voice_agent/index.html")
+
+
+def _debug_allowed(request):
+    if not settings.DEBUG_TOKEN:
+        return settings.DEBUG
+    token = request.headers.get("X-Debug-Token") or request.GET.get("token", "")
+    return hmac.compare_digest(token, settings.DEBUG_TOKEN)
+
+
+def _tool_allowed(request):
+    # Tools serve customer data: refused until a token is configured
+    if not settings.TOOL_TOKEN:
+        return False
+    auth = request.headers.get("Authorization", "")
+    token = auth[len("Bearer "):] if auth.startswith("Bearer ") else ""
+    return hmac.compare_digest(token, settings.TOOL_TOKEN)
+
+
+def _positive_float(value):
+    """Parse a finite, positive number from a query parameter; None if invalid."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) and number > 0 else None
+
+
+async def hamsa_metrics(request):
+    return JsonResponse({
+        "rate_limiter": hamsa_limiter.snapshot(),
+        "tts_transport": tts_selector.snapshot(),
+    })
+
+
+def session_turns(request, session_id):
+    if not _debug_allowed(request):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    if not turn_store.enabled:
+        return JsonResponse({"error": "turn store not configured"}, status=503)
+    try:
+        limit = int(request.GET.get("limit", 100))
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return JsonResponse({"error": "'limit' must be a positive integer"}, status=400)
+    return JsonResponse({
+        "session_id": session_id,
+        "turns": turn_store.session_history(session_id, min(limit, 1000)),
+    })
+
+
+def turn_latency(request):
+    if not _debug_allowed(request):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    if not turn_store.enabled:
+        return JsonResponse({"error": "turn store not configured"}, status=503)
+    window = _positive_float(request.GET.get("window", 3600))
+    if window is None:
+        return JsonResponse({"error": "'window' must be a positive number of seconds"}, status=400)
+    return JsonResponse({
+        "window_s": window,
+        "stages": turn_store.latency_percentiles(window),
+        "store": turn_store.stats(),
+    })
+
+
+async def debug_sessions(request):
+    if not _debug_allowed(request):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    return JsonResponse(registry.snapshot())
+
+
+def debug_loop(request):
+    if not _debug_allowed(request):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    return JsonResponse(loop_monitor.stats())
+
+
+def debug_profile(request):
+    if not _debug_allowed(request):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    seconds = _positive_float(request.GET.get("seconds", 10))
+    if seconds is None:
+        return JsonResponse({"error": "'seconds' must be a positive number"}, status=400)
+    seconds = min(seconds, 300)
+    try:
+        path = start_profile(seconds)
+    except OSError as e:
+        return JsonResponse({"error": f"cannot write profiles to {settings.PROFILE_DIR}: {e}"}, status=503)
+    if path is None:
+        return JsonResponse(
+            {"error": "profiler busy or event loop not started yet"}, status=409
+        )
+    return JsonResponse({"seconds": seconds, "path": path}, status=202)
+
+
+async def tracking_lookup(request):
+    """Agent tool: look up shipments by ``waybill_number`` or ``phone_number``.
+
+    Accepts query parameters or a JSON body (the field names of the n8n
+    LookupByWaybill / LookupByPhone tools are accepted too).
+    """
+    if not _tool_allowed(request):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    if not tracking_store.enabled:
+        return JsonResponse({"error": "tracking data not configured"}, status=503)
+
+    if request.method == "POST" and request.body:
+        try:
+            params = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "invalid JSON"}, status=400)
+        if not isinstance(params, dict):
+            return JsonResponse({"error": "JSON body must be an object"}, status=400)
+    else:
+        params = request.GET
+
+    if tracking_store.loaded_at is None:
+        # Initial load still running: wait for it rather than report "not found"
+        await asyncio.to_thread(tracking_store.ensure_loaded)
+    if tracking_store.needs_reload():
+        await asyncio.to_thread(tracking_store.reload)
+    if tracking_store.loaded_at is None:
+        return JsonResponse(
+            {"error": "tracking data not loaded", "detail": tracking_store.last_error},
+            status=503,
+        )
+
+    waybill = params.get("waybill_number") or params.get("waybillNumber")
+    phone = params.get("phone_number") or params.get("senderPhone")
+    if waybill:
+        results = tracking_store.by_waybill(waybill)
+    elif phone:
+        results = tracking_store.by_phone(phone)
+    else:
+        return JsonResponse({"error": "'waybill_number' or 'phone_number' is required"}, status=400)
+
+    return JsonResponse(
+        {"found": bool(results), "results": results},
+        json_dumps_params={"ensure_ascii": False},
+    )
+
+
+def tracking_stats(request):
+    if not _tool_allowed(request):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    return JsonResponse(tracking_store.stats())